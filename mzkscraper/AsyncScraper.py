@@ -0,0 +1,326 @@
+import asyncio
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Iterable, Literal, Optional
+
+import inflection
+from PIL import Image, ImageFile
+from tqdm.asyncio import tqdm_asyncio
+
+from .AsyncTransport import AsyncMZKTransport
+from .Citations.PageNumberIndex import PageNumberIndex
+from .DownloadResult import DownloadResult
+from .MZKBase import MZKBase
+from .PageData import PageData
+from .QueryFactory import SolrQueryFactory
+from .RateLimit import AsyncRateLimiter
+from .Scraper import DOWNLOAD_CHUNK_SIZE, PAGE_BATCH_SIZE, MZKScraper
+
+
+class AsyncMZKScraper(MZKBase):
+    """
+    Asynchronous counterpart of `MZKScraper`, all methods that communicate with MZK are coroutines.
+    Use as an async context manager or call `close` when done.
+    """
+
+    def __init__(self, transport: Optional[AsyncMZKTransport] = None):
+        """
+        :param transport: transport used for all requests, new transport is created if None
+        """
+        super().__init__(transport)
+        self.query_factory = SolrQueryFactory()
+
+    def _create_default_transport(self) -> AsyncMZKTransport:
+        return AsyncMZKTransport(rate_limiter=AsyncRateLimiter())
+
+    async def close(self):
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def retrieve_document_ids_by_solr_query(
+            self,
+            query: str,
+            requested_document_count: int | Literal["all"] = "all",
+            batch_size: int = 100,
+    ) -> list[str]:
+        """
+        Search documents by Solr solr_query in MZK. All batches are requested concurrently.
+
+        :param query: search solr_query in Solr format
+        :param requested_document_count: requested number of pages, "all" for all documents
+        :param batch_size: batch size, defaults to 100; this many documents will be requested at once
+        """
+        # set number of document ids to retrieve
+        total_document_count = await self._get_number_of_documents_available(query)
+        if requested_document_count == "all":
+            to_retrieve = total_document_count
+        else:
+            to_retrieve = min(total_document_count, requested_document_count)
+
+        field_list = MZKScraper._get_field_list_part(("pid",))
+
+        async def retrieve_batch(offset: int) -> list[str]:
+            result = await self.transport.get_json(
+                self.solr_search_url + query + field_list
+                + f"&rows={min(batch_size, to_retrieve - offset)}&start={offset}"
+            )
+            assert result is not None
+            return [doc["pid"][5:] for doc in result["response"]["docs"]]
+
+        batches = await tqdm_asyncio.gather(*[
+            retrieve_batch(offset) for offset in range(0, to_retrieve, batch_size)
+        ])
+        return [doc_id for batch in batches for doc_id in batch]
+
+    async def _get_number_of_documents_available(self, query: str) -> int:
+        """
+        Returns the number of documents available in MZK based on Solr solr_query.
+
+        :param query: Solr solr_query
+        """
+        result = await self.transport.get_json(self.solr_search_url + query + "&rows=0&start=0")
+        assert result is not None
+
+        return int(result["response"]["numFound"])
+
+    def construct_solr_query_with_qf(self, **kwargs) -> str:
+        """
+        Constructs Solr solr_query for document retrieval using reverse-engineered QueryFactory.
+        Accepts the same arguments as `MZKScraper.construct_solr_query_with_qf`.
+        """
+        return self.query_factory.create_query(**kwargs)
+
+    async def get_pages_in_document(
+            self,
+            doc_id: str,
+            valid_labels: Optional[list[str]] = None,
+            label_preprocessing: Optional[Callable[[str], str]] = None,
+            label_formatting: Callable[[str], str] = inflection.underscore,
+            page_batch_size: int = PAGE_BATCH_SIZE,
+            page_index: Optional[PageNumberIndex] = None,
+    ) -> list[PageData] | None:
+        """
+        Sends request to MZK and parses information about all pages inside a document.
+        Sub-documents of a Konvolut are requested concurrently, nested Konvoluts are resolved as well.
+
+        :param doc_id: Document ID
+        :param valid_labels: list of valid labels strings, if None all labels are valid
+        :param label_preprocessing: function that takes text retrieved from IIIF call and returns preprocessed label
+        :param label_formatting: function that takes label and returns formatted label
+        :param page_batch_size: number of pages listed by a single request
+        :param page_index: if given, page numbers of the document are stored in it from the listing,
+            see `MZKScraper.get_pages_in_document`
+
+        :return: List of `PageData` objects or None, if request fails
+        """
+        page_data = await self._get_page_listing(doc_id, page_batch_size)
+
+        if page_data is None:
+            return None
+
+        if page_index is not None:
+            page_index.put_listing(doc_id, page_data["response"]["docs"])
+
+        if not MZKScraper._is_konvolut(page_data):
+            return MZKScraper.extract_page_ids_from_document(
+                page_data,
+                doc_id,
+                valid_labels=valid_labels,
+                label_preprocessing=label_preprocessing,
+                label_formatting=label_formatting,
+            )
+
+        print(f"Document {doc_id} is a Konvolut, resolving")
+
+        def read(sub_page_data: Optional[dict[str, dict]]) -> tuple[list[PageData], Optional[list[str]]] | None:
+            # same form as `MZKScraper._read_page_listing`
+            if sub_page_data is None:
+                return None
+            if MZKScraper._is_konvolut(sub_page_data):
+                return [], [sub_doc["pid"][5:] for sub_doc in sub_page_data["response"]["docs"]]
+            return MZKScraper.extract_page_ids_from_document(
+                sub_page_data,
+                doc_id,
+                valid_labels=valid_labels,
+                label_preprocessing=label_preprocessing,
+                label_formatting=label_formatting,
+            ), None
+
+        # same tree walk as `MZKScraper._resolve_konvolut`, each level is listed concurrently
+        visited = {doc_id}
+        _, sub_doc_ids = read(page_data)
+        parts: dict[str, list[str]] = {doc_id: MZKScraper._unvisited(sub_doc_ids, visited)}
+        pages: dict[str, list[PageData]] = {}
+
+        frontier = parts[doc_id]
+        while len(frontier) > 0:
+            sub_page_datas = await asyncio.gather(*[
+                self._get_page_listing(sub_doc_id, page_batch_size) for sub_doc_id in frontier
+            ])
+            frontier = MZKScraper._add_konvolut_level(
+                frontier, [read(sub_page_data) for sub_page_data in sub_page_datas], parts, pages, visited
+            )
+
+        return MZKScraper._collect_konvolut_pages(doc_id, parts, pages)
+
+    async def _get_page_listing(self, doc_id: str, rows: int) -> Optional[dict[str, dict]]:
+        """
+        Lists all pages of a document, `rows` pages at a time, and joins them into a single Solr response.
+        Returns None if any request fails.
+        """
+        docs = []
+        total = None
+        while total is None or len(docs) < total:
+            page_data = await self.transport.get_json(
+                self.list_pages_solr_paged.format(doc_id=doc_id, rows=rows, start=len(docs))
+            )
+            if page_data is None:
+                return None
+            total = int(page_data["response"]["numFound"])
+            if len(page_data["response"]["docs"]) == 0:
+                break
+            docs.extend(page_data["response"]["docs"])
+
+        return {"response": {"numFound": len(docs), "docs": docs}}
+
+    async def _save_image(self, url: str, filepath: Path) -> int:
+        """
+        Streams image from url into a temporary file next to `filepath`,
+        the file is renamed to `filepath` only after the whole image is received.
+        Returns status code of the response.
+        """
+        async with self.transport.get(url) as response:
+            if response.status != 200:
+                return response.status
+
+            fd, tmp_path = tempfile.mkstemp(dir=filepath.parent, prefix=f".{filepath.name}.", suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        file.write(chunk)
+                os.replace(tmp_path, filepath)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+
+            return response.status
+
+    async def download_image(
+            self,
+            img_id: str,
+            file_name: str,
+            output_dir: Path,
+            size: str = "^!640,640",
+            verbose=False,
+    ) -> bool:
+        """
+        Given an image ID downloads it to specified directory.
+
+        :param img_id: image ID
+        :param file_name: output file name, with extension
+        :param output_dir: output directory
+        :param size: size of image, for more see IIIF docs
+        :param verbose: verbose mode
+
+        :return: True if the image was downloaded, False otherwise
+        """
+        output_dir.mkdir(exist_ok=True, parents=True)
+
+        status_code = await self._save_image(self._get_img_request_url(img_id, size), Path(output_dir / file_name))
+        if status_code == 200:
+            if verbose:
+                print(f"Image downloaded: {file_name}")
+            return True
+        else:
+            print(f"Error: {status_code}")
+            return False
+
+    async def download_pages(
+            self,
+            pages: Iterable[PageData],
+            output_dir: Path,
+            size: str = "^!640,640",
+            file_name_gen: Optional[Callable[[PageData], str]] = None,
+            progress: bool = True,
+    ) -> DownloadResult:
+        """
+        Downloads images of all given pages concurrently,
+        number of simultaneous downloads is limited by connection limits of the transport.
+
+        :param pages: pages to download, for example output of `get_pages_in_document`
+        :param output_dir: output directory
+        :param size: size of images, for more see IIIF docs
+        :param file_name_gen: function that takes a page and returns output file name, defaults to "{page_id}.jpg"
+        :param progress: whether to show progress bar
+
+        :return: `DownloadResult` with downloaded and failed pages
+        """
+        if file_name_gen is None:
+            file_name_gen = MZKScraper._default_page_file_name
+
+        pages = list(pages)
+        output_dir.mkdir(exist_ok=True, parents=True)
+
+        async def download(page: PageData) -> tuple[PageData, Path, Optional[str]]:
+            filepath = Path(output_dir / file_name_gen(page))
+            try:
+                status_code = await self._save_image(self._get_img_request_url(page.page_id, size), filepath)
+            except Exception as e:
+                return page, filepath, str(e)
+            if status_code != 200:
+                return page, filepath, f"Status code: {status_code}"
+            return page, filepath, None
+
+        result = DownloadResult()
+        for page, filepath, error in await tqdm_asyncio.gather(*[download(page) for page in pages],
+                                                               disable=not progress):
+            if error is None:
+                result.succeeded.append((page, filepath))
+            else:
+                result.failed.append((page, error))
+
+        return result
+
+    async def get_image(
+            self,
+            img_id: str,
+            size: str = "^!640,640",
+            verbose=False,
+            max_bytes: Optional[int] = 64 * 1024 * 1024,
+    ) -> Optional[ImageFile.ImageFile]:
+        """
+        Given an image ID downloads it and returns it as `PIL` image.
+
+        :param img_id: image ID
+        :param size: size of image, for more see IIIF docs
+        :param verbose: verbose mode
+        :param max_bytes: maximum size of the downloaded image in bytes, larger images are not loaded into memory,
+            None for no limit
+        """
+        async with self.transport.get(self._get_img_request_url(img_id, size)) as response:
+            if response.status != 200:
+                print(f"Error: {response.status}")
+                return None
+
+            if max_bytes is not None and response.content_length is not None and response.content_length > max_bytes:
+                print(f"Error: Image {img_id} has {response.content_length} bytes, limit is {max_bytes}")
+                return None
+
+            buffer = BytesIO()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                buffer.write(chunk)
+                if max_bytes is not None and buffer.tell() > max_bytes:
+                    print(f"Error: Image {img_id} exceeds limit of {max_bytes} bytes")
+                    return None
+
+        if verbose:
+            print(f"Image downloaded: {img_id}")
+        buffer.seek(0)
+        return Image.open(buffer)
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import aiohttp
+
+from .RateLimit import AsyncRateLimiter, get_endpoint
+from .Transport import RETRY_STATUS_CODES, get_backoff
+
+
+class AsyncMZKTransport:
+    """
+    Asynchronous counterpart of `MZKTransport` built on `aiohttp`.
+
+    Keeps a single `aiohttp.ClientSession`, the number of open connections is limited in total and per host,
+    requests above the limit wait for a free connection.
+    The session is created lazily inside the running event loop, close the transport when done.
+    If an `AsyncRateLimiter` is given, every attempt waits for it and reports its latency and outcome back.
+    """
+
+    def __init__(
+            self,
+            limit: int = 100,
+            limit_per_host: int = 16,
+            timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=None, connect=10, sock_read=60),
+            max_retries: int = 3,
+            backoff_factor: float = 0.5,
+            max_backoff: float = 30,
+            rate_limiter: Optional[AsyncRateLimiter] = None,
+    ):
+        """
+        :param limit: maximum number of simultaneously open connections
+        :param limit_per_host: maximum number of simultaneously open connections to a single host
+        :param timeout: request timeout
+        :param max_retries: how many times a failed request is retried, 0 disables retries
+        :param backoff_factor: base of the exponential backoff, n-th retry waits `backoff_factor * 2 ** n` seconds
+        :param max_backoff: upper bound of a single wait between retries in seconds
+        :param rate_limiter: limiter of request rate and concurrency, requests are not limited if None
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.rate_limiter = rate_limiter
+
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host),
+                timeout=self.timeout,
+            )
+        return self._session
+
+    @asynccontextmanager
+    async def get(self, url: str, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Sends GET request, retries on connection errors and on `RETRY_STATUS_CODES`.
+        Yields the last response even if its status code signals an error,
+        the connection is released when the context is left.
+
+        :param url: url string
+        :param kwargs: other arguments passed to `aiohttp.ClientSession.get`
+        """
+        session = self._get_session()
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._send(session, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(get_backoff(attempt, self.backoff_factor, self.max_backoff))
+                attempt += 1
+                continue
+
+            if response.status not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                break
+
+            wait = get_backoff(attempt, self.backoff_factor, self.max_backoff, response.headers.get("Retry-After"))
+            response.release()
+            await asyncio.sleep(wait)
+            attempt += 1
+
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def _send(self, session: aiohttp.ClientSession, url: str, **kwargs) -> aiohttp.ClientResponse:
+        if self.rate_limiter is None:
+            return await session.get(url, **kwargs)
+
+        await self.rate_limiter.acquire()
+        start = time.monotonic()
+        error = True
+        try:
+            response = await session.get(url, **kwargs)
+            error = response.status in RETRY_STATUS_CODES
+            return response
+        finally:
+            # only the time to response headers is measured
+            await self.rate_limiter.release(time.monotonic() - start, error, get_endpoint(url))
+
+    async def get_json(self, url: str):
+        """
+        Given an url string, returns a JSON object.
+
+        :param url: url string
+
+        :returns: JSON object or None, if the request fails
+        """
+        try:
+            async with self.get(url) as response:
+                if response.status == 200:
+                    return await response.json(content_type=None)
+                print(f"Error: Failed to retrieve data. Status code: {response.status}")
+                return None
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
+    async def get_bytes(self, url: str) -> Optional[bytes]:
+        """
+        Given an url string, returns response body.
+
+        :param url: url string
+
+        :returns: response body or None, if the request fails
+        """
+        try:
+            async with self.get(url) as response:
+                if response.status == 200:
+                    return await response.read()
+                print(f"Error: {response.status}")
+                return None
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
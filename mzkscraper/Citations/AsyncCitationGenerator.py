@@ -0,0 +1,166 @@
+import asyncio
+from typing import Iterable, Optional
+
+from ..AsyncTransport import AsyncMZKTransport
+from ..MZKBase import MZKBase
+from ..RateLimit import AsyncRateLimiter
+from .Citation import Citation
+from .CitationGenerator import MZKCitationGenerator
+from .PageNumberIndex import PageNumberIndex
+
+
+class AsyncMZKCitationGenerator(MZKBase):
+    """
+    Asynchronous counterpart of `MZKCitationGenerator`, all methods that communicate with MZK are coroutines.
+    Use as an async context manager or call `close` when done.
+    """
+
+    def __init__(self, transport: Optional[AsyncMZKTransport] = None, page_index: Optional[PageNumberIndex] = None):
+        """
+        :param transport: transport used for all requests, new transport is created if None
+        :param page_index: index of page numbers of recently cited documents, new one is created if None
+        """
+        super().__init__(transport)
+        self.page_index = page_index if page_index is not None else PageNumberIndex()
+
+    def _create_default_transport(self) -> AsyncMZKTransport:
+        return AsyncMZKTransport(rate_limiter=AsyncRateLimiter())
+
+    async def close(self):
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def get_iso_690_citation_directly(self, uuid: str, italic=True) -> Optional[str]:
+        """
+        Using MZK API, can cite document or a specific page. Returns plain text citation.
+
+        :param uuid: document or page id
+        :param italic: whether to include italic text styling, default is True
+        """
+        citation_url = "https://citace.kramerius.cloud/v1/kramerius?url=https://api.kramerius.mzk.cz&uuid=uuid:{doc_id}&format=html&lang=en&k7=true"
+
+        async with self.transport.get(citation_url.format(doc_id=uuid)) as response:
+            if response.status == 200:
+                text = await response.text()
+                if not italic:
+                    return text.replace("<i>", "").replace("</i>", "")
+                return text
+            else:
+                print(f"Returned {response.status}")
+                return None
+
+    async def get_page_number_from_document(self, doc_id: str, page_id: str) -> int:
+        """
+        Requests metadata of a document via `doc_id` from library and tries to match page number to `page_id`.
+        Metadata are requested only for documents missing in `page_index`.
+        In case of failure, -1 is returned.
+
+        :param doc_id: document ID
+        :param page_id: page ID
+
+        :return: page number or -1 if failure
+        """
+        page_numbers = await self._get_page_numbers(doc_id)
+        if page_numbers is None:
+            return -1
+        return page_numbers.get(page_id)
+
+    async def _get_page_numbers(self, doc_id: str) -> Optional[dict[str, int]]:
+        page_numbers = self.page_index.get(doc_id)
+        if page_numbers is not None:
+            return page_numbers
+
+        page_info = await self.transport.get_json(self.iiif_request_url + doc_id)
+        if page_info is None:
+            return None
+        return self.page_index.put_manifest(doc_id, page_info, self.uuid_pattern)
+
+    async def retrieve_citation_data_from_document_metadata(
+            self,
+            doc_id: str,
+            page_id: str = None
+    ) -> Citation | None:
+        """
+        Requests document metadata from library and finds all relevant information for proper citation.
+        Metadata and page number are requested concurrently.
+
+        :param doc_id: document ID
+        :param page_id: page ID, optional, returns page number only if page_id is provided
+
+        :return: Citation object or None if failure
+        """
+        async def get_page_number() -> Optional[int]:
+            if page_id is None:
+                return None
+            return await self.get_page_number_from_document(doc_id, page_id)
+
+        xml_content, page_number = await asyncio.gather(
+            self.transport.get_bytes(self.document_metadata.format(doc_id=doc_id)),
+            get_page_number(),
+        )
+
+        if xml_content is None:
+            return None
+        return MZKCitationGenerator._parse_citation_from_mods(
+            xml_content,
+            self.mzk_view_document + doc_id,
+            page_number,
+        )
+
+    async def retrieve_citations(self, pairs: Iterable[tuple[str, Optional[str]]]) -> list[Citation]:
+        """
+        Retrieves citations of many documents or pages at once.
+        Metadata of every document is requested only once, and so is its IIIF manifest if any of its pages is cited
+        and the document is not in `page_index`. All requests are sent concurrently.
+
+        :param pairs: (document ID, page ID) pairs, page ID is None to cite the whole document
+
+        :return: Citation of every pair in the order of `pairs`, pairs whose document metadata could not be
+            retrieved or parsed are left out, pages of documents whose manifest could not be read get number -1;
+            ready to be passed to `group_page_citation_by_document_id`
+        """
+        pairs = list(pairs)
+        doc_ids = list(dict.fromkeys(doc_id for doc_id, _ in pairs))
+        paged_doc_ids = list(dict.fromkeys(doc_id for doc_id, page_id in pairs if page_id is not None))
+
+        # a failure of one document is printed and leaves only that document out
+        async def retrieve_document(doc_id: str) -> Optional[Citation]:
+            try:
+                xml_content = await self.transport.get_bytes(self.document_metadata.format(doc_id=doc_id))
+                if xml_content is None:
+                    return None
+                return MZKCitationGenerator._parse_citation_from_mods(xml_content, self.mzk_view_document + doc_id, None)
+            except Exception as e:
+                print(f"Error: Failed to retrieve metadata of {doc_id}: {e}")
+                return None
+
+        async def retrieve_page_numbers(doc_id: str) -> Optional[dict[str, int]]:
+            try:
+                return await self._get_page_numbers(doc_id)
+            except Exception as e:
+                print(f"Error: Failed to retrieve page numbers of {doc_id}: {e}")
+                return None
+
+        results = await asyncio.gather(
+            *[retrieve_document(doc_id) for doc_id in doc_ids],
+            *[retrieve_page_numbers(doc_id) for doc_id in paged_doc_ids],
+        )
+        citations = dict(zip(doc_ids, results[:len(doc_ids)]))
+        page_numbers = dict(zip(paged_doc_ids, results[len(doc_ids):]))
+
+        return MZKCitationGenerator._fan_out_citations(pairs, citations, page_numbers)
+
+    @staticmethod
+    def group_page_citation_by_document_id(citations: list[Citation]) -> list[Citation]:
+        """
+        Given a list of Citations, this method joins them by document ID and updates page numbers in the new Citations.
+
+        :param citations: list of Citations
+        :return: list of Citations
+        """
+        return MZKCitationGenerator.group_page_citation_by_document_id(citations)
@@ -1,5 +1,6 @@
-from collections import Counter
-from typing import Callable, Optional
+import functools
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, TextIO
 import nltk
 from nltk.corpus import stopwords
 
@@ -8,6 +9,64 @@ from .ICitation import ICitation
 
 nltk.download("stopwords")
 
+# tag base of citations without authors and title
+ANONYMOUS_TAG = "anon"
+
+
+@functools.lru_cache(maxsize=None)
+def _get_stopwords() -> frozenset[str]:
+    return frozenset(stopwords.words('english'))
+
+
+class TagRegistry:
+    """
+    Keeps BibTeX tags already used in a bibliography and hands out new unique ones.
+
+    For every tag base, the next free suffix is remembered, so finding a unique tag
+    does not try all previous suffixes again.
+    """
+
+    def __init__(self, tags: Iterable[str] = ()):
+        """
+        :param tags: tags that are already used
+        """
+        self._tags: set[str] = set()
+        self._next_suffix: dict[str, int] = {}
+        for tag in tags:
+            self.add(tag)
+
+    def add(self, tag: str):
+        """
+        Marks tag as used.
+        """
+        self._tags.add(tag)
+
+    def reserve(self, tag_base: str) -> str:
+        """
+        Returns a unique tag made from `tag_base` and marks it as used.
+        The base itself is tried first, then "base:1", "base:2", ...
+        """
+        tag = tag_base
+        if tag in self._tags:
+            i = self._next_suffix.get(tag_base, 1)
+            # suffixes may have been taken by tags added directly
+            while f"{tag_base}:{i}" in self._tags:
+                i += 1
+            tag = f"{tag_base}:{i}"
+            self._next_suffix[tag_base] = i + 1
+
+        self._tags.add(tag)
+        return tag
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._tags
+
+    def __len__(self):
+        return len(self._tags)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tags)
+
 
 class CitationBibTeX:
     def __init__(self):
@@ -18,7 +77,7 @@ class CitationBibTeX:
             citation: ICitation,
             template: str = "@misc",
             indent: int = 4,
-            used_tags: Optional[list[str]] = None,
+            used_tags: Optional[list[str] | TagRegistry] = None,
             default_author: str = "",
             tag_gen: Optional[Callable[[ICitation], str]] = None,
     ) -> str:
@@ -28,7 +87,8 @@ class CitationBibTeX:
         :param citation: Citation object
         :param template: template for BibTeX citation
         :param indent: indentation for each citation element
-        :param used_tags: list of used tags to eliminate conflicts
+        :param used_tags: used tags to eliminate conflicts, a `TagRegistry` is updated with the new tag,
+            a list is left untouched
         :param default_author: default author for bibtex citation ("", "Anon", etc.)
         :param tag_gen: function for generating tags from Citation object for BibTeX citation
         :return: BibTeX citation string
@@ -39,15 +99,17 @@ class CitationBibTeX:
         if tag_gen is None:
             tag_gen = CitationBibTeX.base_tag_generator
         tag_base = tag_gen(citation)
-        tag = tag_base
 
-        # Rather primitive approach.
-        # Iterates through possibilities "name:index" and tries them all until something works.
-        # May have to be improved in the future.
-        i = 1
-        while tag in used_tags:
-            tag = tag_base + ":" + str(i)
-            i += 1
+        if isinstance(used_tags, TagRegistry):
+            tag = used_tags.reserve(tag_base)
+        else:
+            # tries "name:index" possibilities until something works, use TagRegistry for many citations
+            used_tags = set(used_tags)
+            tag = tag_base
+            i = 1
+            while tag in used_tags:
+                tag = tag_base + ":" + str(i)
+                i += 1
 
         # assemble citation string
         return f",\n{indent * ' '}".join([
@@ -62,33 +124,72 @@ class CitationBibTeX:
             f"url = {{{citation.document_url if citation.document_url else ''}}}",
         ]) + "\n}"
 
+    @staticmethod
+    def render_bibliography(
+            citations: Iterable[ICitation],
+            file: Path | TextIO,
+            used_tags: Optional[TagRegistry] = None,
+            **kwargs,
+    ) -> int:
+        """
+        Writes BibTeX citations one by one into a file, each with a unique tag.
+        Citations are not kept in memory, so they can be generated lazily.
+
+        :param citations: Citation objects
+        :param file: output path or text file object
+        :param used_tags: tags that must not be used, updated with the new tags; new registry is used if None
+        :param kwargs: other arguments of `get_bibtex_citation`
+
+        :return: number of written citations
+        """
+        if isinstance(file, Path):
+            with open(file, "w", encoding="utf8") as f:
+                return CitationBibTeX.render_bibliography(citations, f, used_tags, **kwargs)
+
+        if used_tags is None:
+            used_tags = TagRegistry()
+
+        written = 0
+        for citation in citations:
+            if written > 0:
+                file.write("\n\n")
+            file.write(CitationBibTeX.get_bibtex_citation(citation, used_tags=used_tags, **kwargs))
+            written += 1
+        if written > 0:
+            file.write("\n")
+        return written
+
     @staticmethod
     def base_tag_generator(citation: ICitation) -> str:
         """
         Creates tag for citation by combining first authors family name and year, if both are not None.
-        If they are, tries given name. When none of the above work, resorts to generating tag from document name.
+        If they are, tries given name. When none of the above work, resorts to generating tag from document name,
+        and to `ANONYMOUS_TAG` if the document has no name either.
 
         :param citation: Citation object
         :return: Tag string
         """
-        if citation.authors[0][1] is not None:
+        if len(citation.authors) > 0 and citation.authors[0][1] is not None:
             tag = CitationUtils.strip_accents(citation.authors[0][1])
             if citation.date_issued is not None:
                 return tag + CitationUtils.strip_date(str(citation.date_issued))
             return tag
 
-        elif citation.authors[0][0] is not None:
+        elif len(citation.authors) > 0 and citation.authors[0][0] is not None:
             tag = CitationUtils.strip_accents(citation.authors[0][0])
             if citation.date_issued is not None:
                 return tag + CitationUtils.strip_date(str(citation.date_issued))
             return tag
 
         else:
-            stopwords_dict = Counter(stopwords.words('english'))
+            stopwords_dict = _get_stopwords()
+            title = citation.title if citation.title is not None else ""
             tag = "".join([
                               CitationUtils.strip_accents(word).capitalize()
-                              for word in citation.title.split() if word not in stopwords_dict
+                              for word in title.split() if word not in stopwords_dict
                           ][:2])
+            if tag == "":
+                tag = ANONYMOUS_TAG
             if citation.date_issued is not None:
                 return tag + CitationUtils.strip_date(str(citation.date_issued))
             return tag
@@ -1,6 +1,6 @@
 from typing import Callable
 
-from .BibTeX import CitationBibTeX
+from .BibTeX import CitationBibTeX, TagRegistry
 from .ICitation import ICitation
 from .ISO690 import CitationISO690
 
@@ -46,7 +46,7 @@ class Citation(ICitation):
             self,
             template: str = "@misc",
             indent: int = 4,
-            used_tags: list[str] = None,
+            used_tags: list[str] | TagRegistry = None,
             default_author: str = "",
             tag_gen: Callable[[ICitation], str] = None,
     ) -> str:
@@ -55,7 +55,8 @@ class Citation(ICitation):
 
         :param template: template for BibTeX citation
         :param indent: indentation for each citation element
-        :param used_tags: list of used tags to eliminate conflicts
+        :param used_tags: used tags to eliminate conflicts, a `TagRegistry` is updated with the new tag,
+            a list is left untouched
         :param default_author: default author for bibtex citation ("", "Anon", etc.)
         :param tag_gen: function for generating tags from Citation object for BibTeX citation
         :return: BibTeX citation string
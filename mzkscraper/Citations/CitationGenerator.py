@@ -1,33 +1,45 @@
-import requests
-import xml.etree.ElementTree as ET
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
 
 from .. import ScraperUtils
 from ..MZKBase import MZKBase
+from ..Transport import MZKTransport, get_default_transport
 from .Citation import Citation
+from .ModsParser import parse_mods
+from .PageNumberIndex import PageNumberIndex
 
 
 class MZKCitationGenerator(MZKBase):
     """
     Generates Citation objects based on given document ID and optional page ID.
     """
-    def __init__(self):
-        super().__init__()
+    def __init__(self, transport: Optional[MZKTransport] = None, page_index: Optional[PageNumberIndex] = None):
+        """
+        :param transport: transport used for all requests, shared default transport is used if None
+        :param page_index: index of page numbers of recently cited documents, new one is created if None
+        """
+        super().__init__(transport)
+        self.page_index = page_index if page_index is not None else PageNumberIndex()
 
     def _get_image_id_from_mzk_json(self, img_json: dict) -> str:
         return self.uuid_pattern.search(img_json["thumbnail"][0]["id"]).group(0)
 
     @staticmethod
-    def get_iso_690_citation_directly(uuid: str, italic=True) -> str:
+    def get_iso_690_citation_directly(uuid: str, italic=True, transport: Optional[MZKTransport] = None) -> str:
         """
         Using MZK API, can cite document or a specific page. Returns plain text citation.
 
         :param uuid: document or page id
         :param italic: whether to include italic text styling, default is True
+        :param transport: transport used to send the request, shared default transport is used if None
         """
+        if transport is None:
+            transport = get_default_transport()
+
         citation_url = "https://citace.kramerius.cloud/v1/kramerius?url=https://api.kramerius.mzk.cz&uuid=uuid:{doc_id}&format=html&lang=en&k7=true"
 
-        response = requests.get(citation_url.format(doc_id=uuid))
+        response = transport.get(citation_url.format(doc_id=uuid))
 
         if response.status_code == 200:
             if not italic:
@@ -40,6 +52,7 @@ class MZKCitationGenerator(MZKBase):
     def get_page_number_from_document(self, doc_id: str, page_id: str) -> int:
         """
         Requests metadata of a document via `doc_id` from library and tries to match page number to `page_id`.
+        Metadata are requested only for documents missing in `page_index`.
         In case of failure, -1 is returned.
 
         :param doc_id: document ID
@@ -47,17 +60,20 @@ class MZKCitationGenerator(MZKBase):
 
         :return: page number or -1 if failure
         """
-        page_info = ScraperUtils.get_json_from_url(self.iiif_request_url + doc_id)
-        if page_info is None:
+        page_numbers = self._get_page_numbers(doc_id)
+        if page_numbers is None:
             return -1
+        return page_numbers.get(page_id)
 
-        try:
-            for page_number, sheet in enumerate(page_info["items"]):
-                current_page_id = self._get_image_id_from_mzk_json(sheet)
-                if current_page_id == page_id:
-                    return page_number
-        except TypeError:
-            return -1
+    def _get_page_numbers(self, doc_id: str) -> Optional[dict[str, int]]:
+        page_numbers = self.page_index.get(doc_id)
+        if page_numbers is not None:
+            return page_numbers
+
+        page_info = ScraperUtils.get_json_from_url(self.iiif_request_url + doc_id, transport=self.transport)
+        if page_info is None:
+            return None
+        return self.page_index.put_manifest(doc_id, page_info, self.uuid_pattern)
 
     def retrieve_citation_data_from_document_metadata(self, doc_id: str, page_id: str = None) -> Citation | None:
         """
@@ -69,106 +85,113 @@ class MZKCitationGenerator(MZKBase):
         :return: Citation object or None if failure
         """
         # request metadata
-        response = requests.get(
-            self.document_metadata.format(doc_id=doc_id),
-        )
+        status_code, xml_content = self.transport.fetch(self.document_metadata.format(doc_id=doc_id))
         if page_id is not None:
             page_number = self.get_page_number_from_document(doc_id, page_id)
         else:
             page_number = None
 
-        if response.status_code == 200:
-            xml_content = response.content
-
-            tree = ET.ElementTree(ET.fromstring(xml_content))
-            root = tree.getroot()
-            ns = {"mods": "http://www.loc.gov/mods/v3"}
-
-            # ==============================
-            # DATE, PLACE, PUBLISHER
-            # ==============================
-            # dateIssued
-            date_issued = root.find(".//mods:dateIssued", ns)
-            date_issued_text = date_issued.text if date_issued is not None else None
-
-            # placeIssued
-            place_issued = root.find('.//mods:placeTerm[@type="text"]', ns)
-            place_issued_text = place_issued.text if place_issued is not None else None
-
-            # publisher
-            publisher = root.find(".//mods:publisher", ns)
-            publisher_text = publisher.text if publisher is not None else None
-
-            # ==============================
-            # IDENTIFIERS
-            # ==============================
-            identifiers = root.findall(".//mods:identifier", ns)
-            identifier_dict = {}
-            for identifier in identifiers:
-                identifier_type = identifier.attrib.get("type")
-                identifier_value = identifier.text
-                identifier_dict[identifier_type] = identifier_value
-
-            # ==============================
-            # TITLE, SUBTITLE
-            # ==============================
-            titles = root.find("./mods:mods/mods:titleInfo", ns)
-            main_title = titles.find("./mods:title", ns)
-            subtitle = titles.find("./mods:subTitle", ns)
-            main_title_text = main_title.text if main_title is not None else None
-            subtitle_text = subtitle.text if subtitle is not None else None
-
-            # ==============================
-            # AUTHORS
-            # ==============================
-            names = root.findall('./mods:mods/mods:name[@type="personal"]', ns)
-            primary_list = []
-            other_list = []
-
-            # iterate through authors
-            for name in names:
-                usage = name.attrib.get("usage")
-
-                family_name = name.find('.//mods:namePart[@type="family"]', ns)
-                given_name = name.find('.//mods:namePart[@type="given"]', ns)
-                family_name_text = family_name.text if family_name is not None else None
-                given_name_text = given_name.text if given_name is not None else None
-
-                # try to search for non "family, given" name
-                if family_name_text is None and given_name_text is None:
-                    name = name.find('.//mods:namePart', ns)
-                    name_text = name.text if name is not None else None
-                    # mess in MZK metadata, full name maybe in on "namepart"
-                    if ", " in name_text:
-                        tmp = name_text.split(", ")
-                        name_tuple = (tmp[1], tmp[0])
-                    else:
-                        name_tuple = (name_text, None)
-                else:
-                    name_tuple = (given_name_text, family_name_text)
-
-                # primary author has to be first
-                if usage == "primary":
-                    primary_list.append(name_tuple)
-                else:
-                    other_list.append(name_tuple)
-
-            authors = primary_list + other_list
-
-            return Citation(
-                authors=authors,
-                title=main_title_text,
-                subtitle=subtitle_text,
-                publisher=publisher_text,
-                date_issued=date_issued_text,
-                place_issued=place_issued_text,
-                page_numbers=[page_number],
-                identifiers=identifier_dict,
-                document_url=self.mzk_view_document + doc_id
+        if status_code == 200:
+            return MZKCitationGenerator._parse_citation_from_mods(
+                xml_content,
+                self.mzk_view_document + doc_id,
+                page_number,
             )
         else:
             return None
 
+    def retrieve_citations(self, pairs: Iterable[tuple[str, Optional[str]]], workers: int = 8) -> list[Citation]:
+        """
+        Retrieves citations of many documents or pages at once.
+        Metadata of every document is requested only once, and so is its IIIF manifest if any of its pages is cited
+        and the document is not in `page_index`. All requests are sent concurrently.
+
+        :param pairs: (document ID, page ID) pairs, page ID is None to cite the whole document
+        :param workers: number of requests sent at once
+
+        :return: Citation of every pair in the order of `pairs`, pairs whose document metadata could not be
+            retrieved or parsed are left out, pages of documents whose manifest could not be read get number -1;
+            ready to be passed to `group_page_citation_by_document_id`
+        """
+        pairs = list(pairs)
+        doc_ids = list(dict.fromkeys(doc_id for doc_id, _ in pairs))
+        paged_doc_ids = list(dict.fromkeys(doc_id for doc_id, page_id in pairs if page_id is not None))
+        page_numbers = {doc_id: self.page_index.get(doc_id) for doc_id in paged_doc_ids}
+        to_index = [doc_id for doc_id, numbers in page_numbers.items() if numbers is None]
+
+        # a failure of one document is printed and leaves only that document out
+        def retrieve_document(doc_id: str) -> Optional[Citation]:
+            try:
+                status_code, xml_content = self.transport.fetch(self.document_metadata.format(doc_id=doc_id))
+                if status_code != 200:
+                    print(f"Error: Failed to retrieve metadata of {doc_id}. Status code: {status_code}")
+                    return None
+                return MZKCitationGenerator._parse_citation_from_mods(xml_content, self.mzk_view_document + doc_id, None)
+            except Exception as e:
+                print(f"Error: Failed to retrieve metadata of {doc_id}: {e}")
+                return None
+
+        def retrieve_page_numbers(doc_id: str) -> Optional[dict[str, int]]:
+            try:
+                return self._get_page_numbers(doc_id)
+            except Exception as e:
+                print(f"Error: Failed to retrieve page numbers of {doc_id}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            citation_futures = [executor.submit(retrieve_document, doc_id) for doc_id in doc_ids]
+            index_futures = [executor.submit(retrieve_page_numbers, doc_id) for doc_id in to_index]
+            citations = {doc_id: future.result() for doc_id, future in zip(doc_ids, citation_futures)}
+            page_numbers.update({doc_id: future.result() for doc_id, future in zip(to_index, index_futures)})
+
+        return MZKCitationGenerator._fan_out_citations(pairs, citations, page_numbers)
+
+    @staticmethod
+    def _fan_out_citations(
+            pairs: list[tuple[str, Optional[str]]],
+            citations: dict[str, Optional[Citation]],
+            page_numbers: dict[str, Optional[dict[str, int]]],
+    ) -> list[Citation]:
+        output = []
+        for doc_id, page_id in pairs:
+            citation = citations[doc_id]
+            if citation is None:
+                continue
+
+            if page_id is None:
+                page_number = None
+            elif page_numbers[doc_id] is None:
+                page_number = -1
+            else:
+                page_number = page_numbers[doc_id].get(page_id)
+
+            output.append(Citation(
+                authors=citation.authors,
+                title=citation.title,
+                subtitle=citation.subtitle,
+                publisher=citation.publisher,
+                date_issued=citation.date_issued,
+                place_issued=citation.place_issued,
+                page_numbers=[page_number],
+                identifiers=citation.identifiers,
+                document_url=citation.document_url,
+            ))
+        return output
+
+    @staticmethod
+    def _parse_citation_from_mods(xml_content: bytes, document_url: str, page_number: Optional[int]) -> Citation:
+        """
+        Parses MODS metadata of a document and finds all relevant information for proper citation,
+        see `parse_mods`.
+
+        :param xml_content: MODS XML
+        :param document_url: url of the document in digital library
+        :param page_number: page number, None if the whole document is cited
+
+        :return: Citation object
+        """
+        return parse_mods(xml_content, document_url, page_number)
+
     @staticmethod
     def _flatten(xss: list[list[any]]) -> list[any]:
         return [x for xs in xss for x in xs]
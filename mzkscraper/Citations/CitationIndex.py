@@ -0,0 +1,242 @@
+import itertools
+import json
+import re
+import sqlite3
+import tarfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from ..ResponseCache import ResponseCache
+from .Citation import Citation
+from .ModsParser import parse_mods
+
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+DOCUMENT_URL_PREFIX = "https://www.digitalniknihovna.cz/mzk/uuid/uuid:"
+
+
+def _parse_record(record: tuple[str, bytes]) -> tuple[str, Optional[str]]:
+    # runs in worker processes, returns citation serialized to JSON or None if the record cannot be parsed
+    doc_id, xml_content = record
+    try:
+        citation = parse_mods(xml_content)
+    except Exception as e:
+        print(f"Error: Failed to parse metadata of {doc_id}: {e}")
+        return doc_id, None
+    return doc_id, json.dumps({
+        "authors": citation.authors,
+        "title": citation.title,
+        "subtitle": citation.subtitle,
+        "publisher": citation.publisher,
+        "date_issued": citation.date_issued,
+        "place_issued": citation.place_issued,
+        "identifiers": citation.identifiers,
+    }, ensure_ascii=False)
+
+
+class CitationIndex:
+    """
+    Local index of citation data keyed by document UUID, stored in a single SQLite file.
+
+    Filled from MODS records stored on disk, in a tarball or in a `ResponseCache`, records are parsed
+    in a process pool by `parse_mods`. Citations are then served without any request to MZK.
+    """
+
+    def __init__(self, path: Path, document_url_prefix: str = DOCUMENT_URL_PREFIX):
+        """
+        :param path: path to the SQLite database, created if it does not exist
+        :param document_url_prefix: url of a document in digital library without its UUID
+        """
+        self.path = path
+        self.document_url_prefix = document_url_prefix
+
+        path.parent.mkdir(exist_ok=True, parents=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS citations (doc_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+
+    # ==============================
+    # INGESTION
+    # ==============================
+    def ingest(
+            self,
+            records: Iterable[tuple[str, bytes]],
+            workers: Optional[int] = None,
+            batch_size: int = 1000,
+    ) -> int:
+        """
+        Parses MODS records and stores their citation data, documents already present are replaced.
+        Records are read lazily, at most `batch_size` of them are kept in memory.
+
+        :param records: (document ID, MODS XML) pairs
+        :param workers: number of parsing processes, defaults to number of CPUs; 1 parses in this process
+        :param batch_size: number of records parsed and stored at once
+
+        :return: number of stored documents
+        """
+        records = iter(records)
+        stored = 0
+
+        executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+        try:
+            while True:
+                batch = list(itertools.islice(records, batch_size))
+                if len(batch) == 0:
+                    return stored
+
+                if executor is None:
+                    parsed = map(_parse_record, batch)
+                else:
+                    parsed = executor.map(_parse_record, batch, chunksize=max(1, len(batch) // 64))
+                rows = [(doc_id, data) for doc_id, data in parsed if data is not None]
+
+                with self._lock:
+                    self._connection.execute("BEGIN")
+                    self._connection.executemany("INSERT OR REPLACE INTO citations VALUES (?, ?)", rows)
+                    self._connection.execute("COMMIT")
+                stored += len(rows)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def ingest_directory(self, directory: Path, pattern: str = "**/*.xml", **kwargs) -> int:
+        """
+        Ingests MODS files from a directory, document ID is the UUID in the file name.
+
+        :param directory: directory with MODS files
+        :param pattern: glob pattern of MODS files
+        :param kwargs: arguments of `ingest`
+
+        :return: number of stored documents
+        """
+        return self.ingest(
+            (
+                (doc_id, file.read_bytes())
+                for file in directory.glob(pattern)
+                if file.is_file() and (doc_id := CitationIndex._get_doc_id(file.name)) is not None
+            ),
+            **kwargs,
+        )
+
+    def ingest_tarball(self, path: Path, **kwargs) -> int:
+        """
+        Ingests MODS files from a (compressed) tar archive without extracting it,
+        document ID is the UUID in the file name.
+
+        :param path: path to the archive
+        :param kwargs: arguments of `ingest`
+
+        :return: number of stored documents
+        """
+        def iter_records() -> Iterator[tuple[str, bytes]]:
+            # read as a stream, so the archive is decompressed only once
+            with tarfile.open(path, "r|*") as tar:
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    doc_id = CitationIndex._get_doc_id(Path(member.name).name)
+                    if doc_id is not None:
+                        yield doc_id, tar.extractfile(member).read()
+
+        return self.ingest(iter_records(), **kwargs)
+
+    def ingest_cache(self, cache: ResponseCache, **kwargs) -> int:
+        """
+        Ingests MODS responses stored in a response cache.
+
+        :param cache: response cache
+        :param kwargs: arguments of `ingest`
+
+        :return: number of stored documents
+        """
+        return self.ingest(
+            (
+                (doc_id, body)
+                for url, body in cache.iter_entries("/metadata/mods")
+                if (doc_id := CitationIndex._get_doc_id(url)) is not None
+            ),
+            **kwargs,
+        )
+
+    @staticmethod
+    def _get_doc_id(name: str) -> Optional[str]:
+        match = UUID_PATTERN.search(name)
+        return match.group(0) if match is not None else None
+
+    # ==============================
+    # LOOKUP
+    # ==============================
+    def get(self, doc_id: str, page_numbers: Optional[int | list[int]] = None) -> Optional[Citation]:
+        """
+        Returns citation of a document or its pages, or None if the document is not indexed.
+
+        :param doc_id: document ID
+        :param page_numbers: cited page numbers, None if the whole document is cited
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT data FROM citations WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return None
+        return self._to_citation(doc_id, row[0], page_numbers)
+
+    def iter_citations(self) -> Iterator[Citation]:
+        """
+        Yields citations of all indexed documents.
+        """
+        with self._lock:
+            doc_ids = [row[0] for row in self._connection.execute("SELECT doc_id FROM citations ORDER BY rowid")]
+        for doc_id in doc_ids:
+            citation = self.get(doc_id)
+            if citation is not None:
+                yield citation
+
+    def _to_citation(self, doc_id: str, data: str, page_numbers: Optional[int | list[int]]) -> Citation:
+        fields = json.loads(data)
+        return Citation(
+            authors=[tuple(author) for author in fields["authors"]],
+            title=fields["title"],
+            subtitle=fields["subtitle"],
+            publisher=fields["publisher"],
+            date_issued=fields["date_issued"],
+            place_issued=fields["place_issued"],
+            page_numbers=page_numbers,
+            identifiers=fields["identifiers"],
+            document_url=self.document_url_prefix + doc_id,
+        )
+
+    def get_iso_690_citation(self, doc_id: str, page_numbers: Optional[int | list[int]] = None) -> Optional[str]:
+        """
+        Returns ISO 690 citation of a document or its pages, or None if the document is not indexed.
+        """
+        citation = self.get(doc_id, page_numbers)
+        return citation.get_iso_690_citation() if citation is not None else None
+
+    def get_bibtex_citation(
+            self,
+            doc_id: str,
+            page_numbers: Optional[int | list[int]] = None,
+            **kwargs,
+    ) -> Optional[str]:
+        """
+        Returns BibTeX citation of a document or its pages, or None if the document is not indexed.
+
+        :param kwargs: arguments of `Citation.get_bibtex_citation`
+        """
+        citation = self.get(doc_id, page_numbers)
+        return citation.get_bibtex_citation(**kwargs) if citation is not None else None
+
+    def __contains__(self, doc_id: str) -> bool:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM citations WHERE doc_id = ?", (doc_id,)
+            ).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM citations").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
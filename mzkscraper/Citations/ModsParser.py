@@ -0,0 +1,129 @@
+from typing import Iterator, Optional
+
+try:
+    from lxml import etree
+    _HAS_LXML = True
+except ImportError:
+    import xml.etree.ElementTree as etree
+    _HAS_LXML = False
+
+from .Citation import Citation
+
+MODS_NAMESPACE = "http://www.loc.gov/mods/v3"
+
+_MODS = f"{{{MODS_NAMESPACE}}}mods"
+_DATE_ISSUED = f"{{{MODS_NAMESPACE}}}dateIssued"
+_PLACE_TERM = f"{{{MODS_NAMESPACE}}}placeTerm"
+_PUBLISHER = f"{{{MODS_NAMESPACE}}}publisher"
+_IDENTIFIER = f"{{{MODS_NAMESPACE}}}identifier"
+_TITLE_INFO = f"{{{MODS_NAMESPACE}}}titleInfo"
+_TITLE = f"{{{MODS_NAMESPACE}}}title"
+_SUBTITLE = f"{{{MODS_NAMESPACE}}}subTitle"
+_NAME = f"{{{MODS_NAMESPACE}}}name"
+_NAME_PART = f"{{{MODS_NAMESPACE}}}namePart"
+_READ_TAGS = (_MODS, _DATE_ISSUED, _PLACE_TERM, _PUBLISHER, _IDENTIFIER)
+
+# marks values not found yet, None is a valid value of an empty element
+_MISSING = object()
+
+
+def _found(value) -> Optional[str]:
+    return None if value is _MISSING else value
+
+
+def _read_name(name: etree.Element) -> tuple:
+    family_name = given_name = any_name = _MISSING
+    for name_part in name.iter(_NAME_PART):
+        if any_name is _MISSING:
+            any_name = name_part.text
+        name_part_type = name_part.get("type")
+        if name_part_type == "family" and family_name is _MISSING:
+            family_name = name_part.text
+        elif name_part_type == "given" and given_name is _MISSING:
+            given_name = name_part.text
+
+    family_name = _found(family_name)
+    given_name = _found(given_name)
+    if family_name is not None or given_name is not None:
+        return given_name, family_name
+
+    # mess in MZK metadata, full name maybe in on "namepart"
+    any_name = _found(any_name)
+    if any_name is not None and ", " in any_name:
+        tmp = any_name.split(", ")
+        return tmp[1], tmp[0]
+    return any_name, None
+
+
+def _iter_elements(xml_content: bytes) -> Iterator:
+    # the tree is built in C and walked once, which is faster than Python-level iterparse events
+    root = etree.fromstring(xml_content)
+    if _HAS_LXML:
+        # only elements read by `parse_mods` reach Python
+        return root.iter(*_READ_TAGS)
+    return root.iter()
+
+
+def parse_mods(
+        xml_content: bytes,
+        document_url: Optional[str] = None,
+        page_number: Optional[int] = None,
+) -> Citation:
+    """
+    Parses MODS metadata of a document in a single pass and finds all relevant information for proper citation.
+    Uses `lxml` if it is installed. Does not need any request, so it can be run in a process pool over stored XML.
+
+    Reads the same elements as `MZKCitationGenerator`: title, subtitle and personal names of the record,
+    first date, place and publisher, and all identifiers. Missing title or name parts are left empty.
+
+    :param xml_content: MODS XML
+    :param document_url: url of the document in digital library
+    :param page_number: page number, None if the whole document is cited
+
+    :return: Citation object
+    """
+    date_issued = place_issued = publisher = title = subtitle = _MISSING
+    identifiers = {}
+    primary_list = []
+    other_list = []
+
+    for element in _iter_elements(xml_content):
+        tag = element.tag
+        if tag == _DATE_ISSUED:
+            if date_issued is _MISSING:
+                date_issued = element.text
+        elif tag == _PLACE_TERM:
+            if place_issued is _MISSING and element.get("type") == "text":
+                place_issued = element.text
+        elif tag == _PUBLISHER:
+            if publisher is _MISSING:
+                publisher = element.text
+        elif tag == _IDENTIFIER:
+            identifiers[element.get("type")] = element.text
+        elif tag == _MODS:
+            # title and names are read only from direct children of the record, not from related items
+            for child in element:
+                if child.tag == _TITLE_INFO:
+                    if title is _MISSING:
+                        main_title = child.find(_TITLE)
+                        sub_title = child.find(_SUBTITLE)
+                        title = main_title.text if main_title is not None else None
+                        subtitle = sub_title.text if sub_title is not None else None
+                elif child.tag == _NAME and child.get("type") == "personal":
+                    # primary author has to be first
+                    if child.get("usage") == "primary":
+                        primary_list.append(_read_name(child))
+                    else:
+                        other_list.append(_read_name(child))
+
+    return Citation(
+        authors=primary_list + other_list,
+        title=_found(title),
+        subtitle=_found(subtitle),
+        publisher=_found(publisher),
+        date_issued=_found(date_issued),
+        place_issued=_found(place_issued),
+        page_numbers=[page_number],
+        identifiers=identifiers,
+        document_url=document_url,
+    )
@@ -0,0 +1,104 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+
+class PageNumberIndex:
+    """
+    Keeps page ID -> page number maps of recently used documents, so that the page number of any page
+    is found without another request and without scanning the whole document.
+
+    A map is built once per document, either from its IIIF manifest or from its Solr page listing.
+    Only the `max_documents` most recently used documents are kept.
+    """
+
+    def __init__(self, max_documents: int = 256):
+        """
+        :param max_documents: maximum number of indexed documents
+        """
+        self.max_documents = max_documents
+
+        self._documents: OrderedDict[str, dict[str, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, doc_id: str) -> Optional[dict[str, int]]:
+        """
+        Returns page ID -> page number map of a document, or None if the document is not indexed.
+        """
+        with self._lock:
+            page_numbers = self._documents.get(doc_id)
+            if page_numbers is not None:
+                self._documents.move_to_end(doc_id)
+            return page_numbers
+
+    def put(self, doc_id: str, page_numbers: dict[str, int]):
+        """
+        Stores page ID -> page number map of a document, least recently used document is dropped if over limit.
+        """
+        with self._lock:
+            self._documents[doc_id] = page_numbers
+            self._documents.move_to_end(doc_id)
+            if len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+    def put_manifest(self, doc_id: str, page_info: dict, uuid_pattern: re.Pattern) -> Optional[dict[str, int]]:
+        """
+        Indexes a document from its IIIF manifest.
+
+        :return: page ID -> page number map, or None if the manifest cannot be read
+        """
+        page_numbers = PageNumberIndex.build_from_manifest(page_info, uuid_pattern)
+        if page_numbers is not None:
+            self.put(doc_id, page_numbers)
+        return page_numbers
+
+    def put_listing(self, doc_id: str, docs: Iterable[dict]) -> Optional[dict[str, int]]:
+        """
+        Indexes a document from Solr documents listing its children, in the order they were returned.
+        Used by `MZKScraper.get_pages_in_document(s)`, so that listed documents are cited without another request.
+        Documents without pages, e.g. Konvoluts, are not indexed.
+
+        :return: page ID -> page number map, or None if the document has no pages
+        """
+        page_numbers = PageNumberIndex.build_from_listing(docs)
+        if len(page_numbers) == 0:
+            return None
+        self.put(doc_id, page_numbers)
+        return page_numbers
+
+    @staticmethod
+    def build_from_manifest(page_info: dict, uuid_pattern: re.Pattern) -> Optional[dict[str, int]]:
+        """
+        Numbers pages by their position in IIIF manifest, returns None if the manifest cannot be read.
+        """
+        try:
+            page_numbers = {}
+            for page_number, sheet in enumerate(page_info["items"]):
+                page_numbers.setdefault(uuid_pattern.search(sheet["thumbnail"][0]["id"]).group(0), page_number)
+            return page_numbers
+        except (TypeError, KeyError, IndexError, AttributeError):
+            # missing items or thumbnails, or thumbnail without UUID
+            return None
+
+    @staticmethod
+    def build_from_listing(docs: Iterable[dict]) -> dict[str, int]:
+        """
+        Numbers pages by their position in Solr listing sorted by `rels_ext_index.sort`,
+        which is the order of IIIF manifest. Children that are not pages are skipped.
+        """
+        page_numbers = {}
+        page_number = 0
+        for doc in docs:
+            if doc.get("model", "page") != "page":
+                continue
+            page_numbers.setdefault(doc["pid"][5:], page_number)
+            page_number += 1
+        return page_numbers
+
+    def __len__(self):
+        return len(self._documents)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
@@ -1,5 +1,5 @@
 from .Citation import Citation
-from .BibTeX import CitationBibTeX
+from .BibTeX import CitationBibTeX, TagRegistry
 from .ICitation import ICitation
 from .ISO690 import CitationISO690
 from .CitationUtils import join_non_empty
\ No newline at end of file
@@ -0,0 +1,236 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from .PageData import PageData, PageDataTable
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+
+
+class CrawlState:
+    """
+    Persistent journal of a long harvest, stored in a single SQLite file.
+
+    Tracks status of every document (listed or not) and every page (downloaded or not),
+    so that an interrupted harvest continues where it stopped.
+    Work is handed out by claiming, a claim is atomic, so several threads or processes
+    can share the same file as a work queue. Claims older than `claim_timeout` are considered abandoned
+    (e.g. the worker crashed) and can be claimed again.
+    """
+
+    def __init__(self, path: Path, claim_timeout: float = 60 * 60, max_attempts: int = 3):
+        """
+        :param path: path to the SQLite database, created if it does not exist
+        :param claim_timeout: number of seconds after which unfinished claim can be taken over by another worker
+        :param max_attempts: how many times a failing item is tried before it is marked as failed
+        """
+        self.path = path
+        self.claim_timeout = claim_timeout
+        self.max_attempts = max_attempts
+
+        path.parent.mkdir(exist_ok=True, parents=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "doc_id TEXT PRIMARY KEY, status TEXT NOT NULL DEFAULT 'pending', worker TEXT, claimed_at REAL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, error TEXT);"
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "doc_id TEXT NOT NULL, page_id TEXT NOT NULL, label TEXT, status TEXT NOT NULL DEFAULT 'pending', "
+            "worker TEXT, claimed_at REAL, attempts INTEGER NOT NULL DEFAULT 0, file_name TEXT, error TEXT, "
+            "PRIMARY KEY (doc_id, page_id));"
+            "CREATE INDEX IF NOT EXISTS documents_status ON documents (status);"
+            "CREATE INDEX IF NOT EXISTS pages_status ON pages (status);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # IMMEDIATE takes the write lock right away, so two workers cannot claim the same rows
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set_meta(self, key: str, value: str):
+        with self._transaction() as connection:
+            connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    # ==============================
+    # DOCUMENTS
+    # ==============================
+    def add_documents(self, doc_ids: Iterable[str]) -> int:
+        """
+        Adds documents to be listed, documents already present are left untouched.
+
+        :return: number of newly added documents
+        """
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany("INSERT OR IGNORE INTO documents (doc_id) VALUES (?)", ((d,) for d in doc_ids))
+            return connection.total_changes - before
+
+    def claim_documents(self, worker: str, count: int) -> list[str]:
+        """
+        Claims up to `count` documents waiting to be listed.
+
+        :param worker: name of the claiming worker
+        :param count: maximum number of documents
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            doc_ids = [row[0] for row in connection.execute(
+                "SELECT doc_id FROM documents WHERE status = ? OR (status = ? AND claimed_at < ?) "
+                "ORDER BY rowid LIMIT ?",
+                (PENDING, CLAIMED, now - self.claim_timeout, count),
+            )]
+            connection.executemany(
+                "UPDATE documents SET status = ?, worker = ?, claimed_at = ?, attempts = attempts + 1 "
+                "WHERE doc_id = ?",
+                ((CLAIMED, worker, now, doc_id) for doc_id in doc_ids),
+            )
+        return doc_ids
+
+    def complete_document(self, doc_id: str, pages: Iterable[PageData]):
+        """
+        Marks document as listed and adds its pages to be downloaded.
+        """
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO pages (doc_id, page_id, label) VALUES (?, ?, ?)",
+                ((page.source, page.page_id, page.label) for page in pages),
+            )
+            connection.execute(
+                "UPDATE documents SET status = ?, error = NULL WHERE doc_id = ?", (DONE, doc_id)
+            )
+
+    def fail_document(self, doc_id: str, error: str):
+        """
+        Returns document to the queue, or marks it as failed once it ran out of attempts.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE documents SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, error = ? WHERE doc_id = ?",
+                (self.max_attempts, FAILED, PENDING, error, doc_id),
+            )
+
+    # ==============================
+    # PAGES
+    # ==============================
+    def claim_pages(self, worker: str, count: int) -> list[PageData]:
+        """
+        Claims up to `count` pages waiting to be downloaded.
+
+        :param worker: name of the claiming worker
+        :param count: maximum number of pages
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT doc_id, page_id, label FROM pages WHERE status = ? OR (status = ? AND claimed_at < ?) "
+                "ORDER BY rowid LIMIT ?",
+                (PENDING, CLAIMED, now - self.claim_timeout, count),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE pages SET status = ?, worker = ?, claimed_at = ?, attempts = attempts + 1 "
+                "WHERE doc_id = ? AND page_id = ?",
+                ((CLAIMED, worker, now, doc_id, page_id) for doc_id, page_id, _ in rows),
+            )
+        return [PageData(doc_id, page_id, label) for doc_id, page_id, label in rows]
+
+    def complete_page(self, page: PageData, file_name: str):
+        """
+        Marks page as downloaded into `file_name`.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE pages SET status = ?, file_name = ?, error = NULL WHERE doc_id = ? AND page_id = ?",
+                (DONE, file_name, page.source, page.page_id),
+            )
+
+    def fail_page(self, page: PageData, error: str):
+        """
+        Returns page to the queue, or marks it as failed once it ran out of attempts.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE pages SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, error = ? "
+                "WHERE doc_id = ? AND page_id = ?",
+                (self.max_attempts, FAILED, PENDING, error, page.source, page.page_id),
+            )
+
+    # ==============================
+    # MAINTENANCE
+    # ==============================
+    def release(self, worker: str):
+        """
+        Returns everything claimed by `worker` back to the queue, e.g. when the worker stops early.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE documents SET status = ?, attempts = attempts - 1 WHERE status = ? AND worker = ?",
+                (PENDING, CLAIMED, worker),
+            )
+            connection.execute(
+                "UPDATE pages SET status = ?, attempts = attempts - 1 WHERE status = ? AND worker = ?",
+                (PENDING, CLAIMED, worker),
+            )
+
+    def retry_failed(self):
+        """
+        Returns all failed documents and pages back to the queue with reset attempts.
+        """
+        with self._transaction() as connection:
+            connection.execute("UPDATE documents SET status = ?, attempts = 0 WHERE status = ?", (PENDING, FAILED))
+            connection.execute("UPDATE pages SET status = ?, attempts = 0 WHERE status = ?", (PENDING, FAILED))
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        """
+        Returns number of documents and pages in each status.
+        """
+        with self._lock:
+            return {
+                table: dict(self._connection.execute(f"SELECT status, COUNT(*) FROM {table} GROUP BY status"))
+                for table in ("documents", "pages")
+            }
+
+    def is_finished(self) -> bool:
+        """
+        Returns whether there are no documents or pages waiting or being worked on.
+        """
+        counts = self.counts()
+        return all(
+            counts[table].get(status, 0) == 0 for table in ("documents", "pages") for status in (PENDING, CLAIMED)
+        )
+
+    def get_pages(self, status: str = DONE) -> PageDataTable:
+        """
+        Returns all pages in given status, in the order they were listed.
+        """
+        table = PageDataTable()
+        with self._lock:
+            for doc_id, page_id, label in self._connection.execute(
+                    "SELECT doc_id, page_id, label FROM pages WHERE status = ? ORDER BY rowid", (status,)
+            ):
+                table.append(doc_id, page_id, label)
+        return table
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
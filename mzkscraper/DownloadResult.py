@@ -0,0 +1,23 @@
+from pathlib import Path
+
+from .PageData import PageData
+
+
+class DownloadResult:
+    """
+    Keeps outcome of a bulk page download.
+    """
+
+    def __init__(self):
+        self.succeeded: list[tuple[PageData, Path]] = []
+        self.failed: list[tuple[PageData, str]] = []
+
+    @property
+    def ok(self) -> bool:
+        return len(self.failed) == 0
+
+    def __len__(self):
+        return len(self.succeeded) + len(self.failed)
+
+    def __str__(self):
+        return f'{type(self).__name__}(succeeded={len(self.succeeded)}, failed={len(self.failed)})'
@@ -0,0 +1,314 @@
+import json
+import os
+import socket
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Literal, Optional
+
+import inflection
+
+from .CrawlState import PENDING, CrawlState
+from .PageData import PageData
+from .RateLimit import RateLimiter
+from .Scraper import MZKScraper
+from .Transport import MZKTransport
+
+
+def get_shard(doc_id: str, shard_count: int) -> int:
+    """
+    Assigns document to one of `shard_count` shards, the assignment is the same on every machine and run.
+    """
+    return zlib.crc32(doc_id.encode("utf8")) % shard_count
+
+
+class MZKHarvester:
+    """
+    Runs the whole search -> page listing -> image download pipeline on top of a `CrawlState`.
+    Every finished step is recorded, so a crashed or stopped harvest continues where it ended when run again.
+    Several harvesters (threads, processes or machines with a shared file system) can work on the same state.
+    """
+
+    def __init__(
+            self,
+            state: CrawlState,
+            output_dir: Path,
+            scraper: Optional[MZKScraper] = None,
+            size: str = "^!640,640",
+            valid_labels: Optional[list[str]] = None,
+            label_preprocessing: Optional[Callable[[str], str]] = None,
+            label_formatting: Callable[[str], str] = inflection.underscore,
+            file_name_gen: Optional[Callable[[PageData], str]] = None,
+            worker: Optional[str] = None,
+    ):
+        """
+        :param state: crawl state shared by all workers of the harvest
+        :param output_dir: output directory for images
+        :param scraper: scraper used for all requests, new one is created if None
+        :param size: size of images, for more see IIIF docs
+        :param valid_labels: list of valid labels strings, if None all labels are valid
+        :param label_preprocessing: function that takes text retrieved from IIIF call and returns preprocessed label
+        :param label_formatting: function that takes label and returns formatted label
+        :param file_name_gen: function that takes a page and returns output file name, defaults to "{page_id}.jpg"
+        :param worker: name of this worker, defaults to "{hostname}:{pid}"
+        """
+        self.state = state
+        self.output_dir = output_dir
+        self.scraper = scraper if scraper is not None else MZKScraper()
+        self.size = size
+        self.valid_labels = valid_labels
+        self.label_preprocessing = label_preprocessing
+        self.label_formatting = label_formatting
+        self.file_name_gen = file_name_gen if file_name_gen is not None else MZKScraper._default_page_file_name
+        self.worker = worker if worker is not None else f"{socket.gethostname()}:{os.getpid()}"
+
+    def seed(
+            self,
+            query: str,
+            requested_document_count: int | Literal["all"] = "all",
+            batch_size: int = 100,
+            use_cursor: bool = False,
+            workers: int = 1,
+            shard: Optional[tuple[int, int]] = None,
+    ) -> int:
+        """
+        Adds documents matching Solr query to the state, documents already present are skipped.
+        With `use_cursor`, the last cursor mark is stored in the state and an interrupted seeding resumes from it.
+
+        :param query: search solr_query in Solr format
+        :param requested_document_count: requested number of documents, "all" for all documents,
+            ignored when `use_cursor` is True
+        :param batch_size: batch size, defaults to 100; this many documents will be requested at once
+        :param use_cursor: if True, uses `cursorMark` paging, see `MZKScraper.iter_document_ids_by_cursor`
+        :param workers: if greater than 1, offset ranges of the result are requested concurrently,
+            see `MZKScraper.retrieve_document_ids_by_solr_query`; ignored when `use_cursor` is True
+        :param shard: (index, count), only documents assigned to shard `index` of `count` by `get_shard` are added,
+            used to split a harvest between machines that do not share the state
+
+        :return: number of newly added documents
+        """
+        def in_shard(doc_ids: list[str]) -> list[str]:
+            if shard is None:
+                return doc_ids
+            index, count = shard
+            return [doc_id for doc_id in doc_ids if get_shard(doc_id, count) == index]
+
+        added = 0
+        if use_cursor:
+            cursor_key = f"seed_cursor:{query}"
+            cursor_mark = self.state.get_meta(cursor_key) or "*"
+            for doc_ids, next_cursor_mark in self.scraper.iter_document_ids_by_cursor(query, batch_size, cursor_mark):
+                added += self.state.add_documents(in_shard(doc_ids))
+                self.state.set_meta(cursor_key, next_cursor_mark)
+        elif workers > 1:
+            added += self.state.add_documents(in_shard(self.scraper.retrieve_document_ids_by_solr_query(
+                query, requested_document_count, batch_size=batch_size, workers=workers
+            )))
+        else:
+            for doc_ids in self.scraper.iter_document_ids(
+                    query, requested_document_count, batch_size=batch_size, batched=True
+            ):
+                added += self.state.add_documents(in_shard(doc_ids))
+        return added
+
+    def list_documents(self, batch_size: int = 50, workers: int = 4) -> int:
+        """
+        Lists pages of claimed documents until no document is left.
+
+        :param batch_size: number of documents claimed and listed at once
+        :param workers: number of listing queries sent at once
+
+        :return: number of listed documents
+        """
+        listed = 0
+        while True:
+            doc_ids = self.state.claim_documents(self.worker, batch_size)
+            if len(doc_ids) == 0:
+                return listed
+
+            pages_by_document = self.scraper.get_pages_in_documents(
+                doc_ids,
+                valid_labels=self.valid_labels,
+                label_preprocessing=self.label_preprocessing,
+                label_formatting=self.label_formatting,
+                workers=workers,
+            )
+            for doc_id in doc_ids:
+                pages = pages_by_document.get(doc_id)
+                if pages is None:
+                    self.state.fail_document(doc_id, "Listing failed")
+                else:
+                    self.state.complete_document(doc_id, pages)
+                    listed += 1
+
+    def download_pages(self, batch_size: int = 200, workers: int = 8) -> int:
+        """
+        Downloads claimed pages until no page is left. Pages whose file already exists are not downloaded again.
+
+        :param batch_size: number of pages claimed at once
+        :param workers: number of images downloaded at once
+
+        :return: number of downloaded pages
+        """
+        downloaded = 0
+        while True:
+            pages = self.state.claim_pages(self.worker, batch_size)
+            if len(pages) == 0:
+                return downloaded
+
+            to_download = []
+            for page in pages:
+                file_name = self.file_name_gen(page)
+                if (self.output_dir / file_name).exists():
+                    self.state.complete_page(page, file_name)
+                else:
+                    to_download.append(page)
+
+            result = self.scraper.download_pages(
+                to_download,
+                self.output_dir,
+                size=self.size,
+                workers=workers,
+                file_name_gen=self.file_name_gen,
+                progress=False,
+            )
+            for page, filepath in result.succeeded:
+                self.state.complete_page(page, filepath.name)
+            for page, error in result.failed:
+                self.state.fail_page(page, error)
+            downloaded += len(result.succeeded)
+
+    def run(self, list_workers: int = 4, download_workers: int = 8):
+        """
+        Lists all documents and downloads all pages in the state, then returns.
+        Claims of this worker are returned to the queue if the run is interrupted.
+
+        :param list_workers: number of listing queries sent at once
+        :param download_workers: number of images downloaded at once
+        """
+        try:
+            while not self.state.is_finished():
+                listed = self.list_documents(workers=list_workers)
+                downloaded = self.download_pages(workers=download_workers)
+                if listed == 0 and downloaded == 0 and not self._has_work_left():
+                    # remaining items are claimed by other workers
+                    break
+        finally:
+            self.state.release(self.worker)
+
+    def _has_work_left(self) -> bool:
+        counts = self.state.counts()
+        return counts["documents"].get(PENDING, 0) > 0 or counts["pages"].get(PENDING, 0) > 0
+
+    def export_manifest(self, path: Path):
+        """
+        Writes all downloaded pages as JSON lines, see `PageDataTable.dump_jsonl`.
+        """
+        self.state.get_pages().dump_jsonl(path)
+
+
+def _run_harvest_worker(
+        state_path: Path,
+        output_dir: Path,
+        harvester_kwargs: dict,
+        list_workers: int,
+        download_workers: int,
+        rate: Optional[float],
+):
+    # every process opens its own SQLite connection and its own HTTP connection pool,
+    # its rate limiter gets only its share of the total rate
+    transport = MZKTransport(rate_limiter=RateLimiter(rate=rate))
+    state = CrawlState(state_path)
+    try:
+        MZKHarvester(state, output_dir, **{"scraper": MZKScraper(transport), **harvester_kwargs}).run(
+            list_workers=list_workers,
+            download_workers=download_workers,
+        )
+    finally:
+        state.close()
+        transport.close()
+
+
+def run_sharded_harvest(
+        query: str,
+        state_path: Path,
+        output_dir: Path,
+        processes: int = 4,
+        requested_document_count: int | Literal["all"] = "all",
+        shard: Optional[tuple[int, int]] = None,
+        list_workers: int = 4,
+        download_workers: int = 8,
+        rate: Optional[float] = 20,
+        **harvester_kwargs,
+) -> dict[str, dict[str, int]]:
+    """
+    Harvests all documents matching Solr query with several processes sharing a single `CrawlState`.
+
+    Documents are seeded once, concurrently by offset ranges, then every process claims documents and pages
+    from the state until nothing is left. To split a harvest between machines, run this function on each of them
+    with a different `shard` and its own `state_path`, and join their manifests with `merge_manifests`.
+
+    :param query: search solr_query in Solr format
+    :param state_path: path to the SQLite crawl state
+    :param output_dir: output directory for images
+    :param processes: number of worker processes
+    :param requested_document_count: requested number of documents, "all" for all documents
+    :param shard: (index, count), harvests only documents assigned to this shard, see `get_shard`
+    :param list_workers: number of listing queries sent at once by each process
+    :param download_workers: number of images downloaded at once by each process
+    :param rate: maximum average number of requests per second of all processes together, split evenly between
+        them, None for no limit; concurrency is adapted by each process on its own, see `RateLimiter`
+    :param harvester_kwargs: other arguments for `MZKHarvester`, have to be picklable
+
+    :return: number of documents and pages in each status after the harvest
+    """
+    state = CrawlState(state_path)
+    try:
+        MZKHarvester(state, output_dir, **harvester_kwargs).seed(
+            query,
+            requested_document_count,
+            workers=processes,
+            shard=shard,
+        )
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [
+                executor.submit(
+                    _run_harvest_worker,
+                    state_path,
+                    output_dir,
+                    harvester_kwargs,
+                    list_workers,
+                    download_workers,
+                    rate / processes if rate is not None else None,
+                )
+                for _ in range(processes)
+            ]
+            for future in futures:
+                future.result()
+
+        return state.counts()
+    finally:
+        state.close()
+
+
+def merge_manifests(manifests: Iterable[Path], output: Path) -> int:
+    """
+    Joins JSON lines manifests written by `MZKHarvester.export_manifest` into one, pages listed twice are kept once.
+
+    :param manifests: paths to manifests
+    :param output: path to the joined manifest
+
+    :return: number of pages in the joined manifest
+    """
+    seen: set[tuple[str, str]] = set()
+    with open(output, "w", encoding="utf8") as out:
+        for manifest in manifests:
+            with open(manifest, "r", encoding="utf8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    key = (record["source"], record["img_id"])
+                    if key not in seen:
+                        seen.add(key)
+                        out.write(line)
+    return len(seen)
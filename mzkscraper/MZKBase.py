@@ -1,12 +1,36 @@
 import re
+from typing import TYPE_CHECKING, Optional
+
+from .Transport import MZKTransport, get_default_transport
+
+if TYPE_CHECKING:
+    from .AsyncTransport import AsyncMZKTransport
 
 
 class MZKBase:
-    def __init__(self):
+    def __init__(self, transport: Optional["MZKTransport | AsyncMZKTransport"] = None):
+        """
+        :param transport: transport used for all requests, default transport is used if None
+        """
+        self.transport = transport if transport is not None else self._create_default_transport()
+
         self.uuid_pattern = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
         self.iiif_request_url = "https://iiif.digitalniknihovna.cz/mzk/uuid:"
         self.iiif_download_url = "https://api.kramerius.mzk.cz/search/iiif/uuid:{img_id}/full/{size}/0/default.jpg"
+        self.solr_search_url = "https://api.kramerius.mzk.cz/search/api/client/v7.0/search?"
         self.mzk_view_page = "https://www.digitalniknihovna.cz/mzk/uuid/uuid:{doc_id}?page=uuid:{page_id}"
         self.mzk_view_document = "https://www.digitalniknihovna.cz/mzk/uuid/uuid:"
         self.document_metadata = "https://api.kramerius.mzk.cz/search/api/client/v7.0/items/uuid:{doc_id}/metadata/mods"
-        self.list_pages_solr = "https://api.kramerius.mzk.cz/search/api/client/v7.0/search?fl=pid,accessibility,model,title.search,licenses,contains_licenses,licenses_of_ancestors,page.type,page.number,page.placement,track.length&q=own_parent.pid:%22uuid:{doc_id}%22&sort=rels_ext_index.sort%20asc&rows=4000&start=0"
+        self.list_pages_fields = "pid,accessibility,model,title.search,licenses,contains_licenses,licenses_of_ancestors,page.type,page.number,page.placement,track.length"
+        list_pages_query = (
+            self.solr_search_url + "fl=" + self.list_pages_fields
+            + "&q=own_parent.pid:%22uuid:{doc_id}%22&sort=rels_ext_index.sort%20asc"
+        )
+        self.list_pages_solr = list_pages_query + "&rows=4000&start=0"
+        self.list_pages_solr_paged = list_pages_query + "&rows={rows}&start={start}"
+
+    def _get_img_request_url(self, img_id: str, size: str) -> str:
+        return self.iiif_download_url.format(img_id=img_id, size=size)
+
+    def _create_default_transport(self) -> "MZKTransport | AsyncMZKTransport":
+        return get_default_transport()
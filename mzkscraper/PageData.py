@@ -1,11 +1,16 @@
+import csv
 import json
-from typing import Optional
+import uuid
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO
 
 
 class PageData:
     """
     Keeps information about a single page of a document.
     """
+    __slots__ = ("source", "page_id", "label", "system_id")
 
     def __init__(self, doc_id: str, page_id: str, label: str):
         self.source = doc_id
@@ -17,6 +22,158 @@ class PageData:
         return f'{self.source} {self.page_id} {self.label}'
 
 
+class PageDataTable:
+    """
+    Keeps information about many pages in columns, uses a fraction of memory of the same number of `PageData`.
+
+    Document IDs and labels repeat across pages, so each distinct value is stored once and pages keep only its index.
+    Page IDs are stored as 16 raw bytes of their UUID.
+    """
+
+    def __init__(self):
+        self._sources: list[str] = []
+        self._source_indices: dict[str, int] = {}
+        self._labels: list[str] = []
+        self._label_indices: dict[str, int] = {}
+
+        self._source_column = array("I")
+        self._label_column = array("I")
+        self._page_id_column = bytearray()
+        # -1 stands for None
+        self._system_id_column = array("q")
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[PageData]) -> "PageDataTable":
+        table = cls()
+        table.extend(pages)
+        return table
+
+    @staticmethod
+    def _intern(value: str, values: list[str], indices: dict[str, int]) -> int:
+        index = indices.get(value)
+        if index is None:
+            index = len(values)
+            values.append(value)
+            indices[value] = index
+        return index
+
+    def append(self, doc_id: str, page_id: str, label: str, system_id: Optional[int] = None):
+        """
+        Adds a single page to the table.
+
+        :param doc_id: document ID
+        :param page_id: page ID, has to be a UUID
+        :param label: page label
+        :param system_id: optional ID of the page
+        """
+        self._source_column.append(PageDataTable._intern(doc_id, self._sources, self._source_indices))
+        self._label_column.append(PageDataTable._intern(label, self._labels, self._label_indices))
+        self._page_id_column += uuid.UUID(page_id).bytes
+        self._system_id_column.append(-1 if system_id is None else system_id)
+
+    def append_page(self, page: PageData):
+        self.append(page.source, page.page_id, page.label, page.system_id)
+
+    def extend(self, pages: Iterable[PageData]):
+        for page in pages:
+            self.append_page(page)
+
+    def __len__(self):
+        return len(self._source_column)
+
+    def __getitem__(self, index: int) -> PageData:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PageDataTable index out of range")
+
+        page = PageData(
+            self._sources[self._source_column[index]],
+            self._get_page_id(index),
+            self._labels[self._label_column[index]],
+        )
+        system_id = self._system_id_column[index]
+        page.system_id = None if system_id == -1 else system_id
+        return page
+
+    def __iter__(self) -> Iterator[PageData]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def _get_page_id(self, index: int) -> str:
+        return str(uuid.UUID(bytes=bytes(self._page_id_column[16 * index:16 * (index + 1)])))
+
+    def _iter_rows(self) -> Iterator[tuple[str, str, str, Optional[int]]]:
+        sources = self._sources
+        labels = self._labels
+        for index in range(len(self)):
+            system_id = self._system_id_column[index]
+            yield (
+                sources[self._source_column[index]],
+                self._get_page_id(index),
+                labels[self._label_column[index]],
+                None if system_id == -1 else system_id,
+            )
+
+    def to_columns(self) -> dict[str, list]:
+        """
+        Returns table as a dictionary of columns, ready to be loaded by `pandas` or `pyarrow`.
+        Column names match keys used by `PageDataEncoder`.
+        """
+        sources, page_ids, labels, system_ids = zip(*self._iter_rows()) if len(self) > 0 else ((), (), (), ())
+        return {
+            "source": list(sources),
+            "img_id": list(page_ids),
+            "label": list(labels),
+            "id": list(system_ids),
+        }
+
+    def to_records(self) -> list[dict]:
+        """
+        Returns table as a list of dictionaries, same as `PageDataEncoder` produces for each `PageData`.
+        """
+        return [
+            {"source": source, "img_id": page_id, "label": label, "id": system_id}
+            for source, page_id, label, system_id in self._iter_rows()
+        ]
+
+    def dump_jsonl(self, file: Path | TextIO):
+        """
+        Writes one JSON object per page, objects have the same keys as those produced by `PageDataEncoder`.
+
+        :param file: output path or text file object
+        """
+        if isinstance(file, Path):
+            with open(file, "w", encoding="utf8") as f:
+                self.dump_jsonl(f)
+            return
+
+        # each distinct value is encoded only once
+        sources = [json.dumps(source) for source in self._sources]
+        labels = [json.dumps(label) for label in self._labels]
+        for index in range(len(self)):
+            system_id = self._system_id_column[index]
+            file.write(
+                f'{{"source": {sources[self._source_column[index]]}, "img_id": "{self._get_page_id(index)}", '
+                f'"label": {labels[self._label_column[index]]}, "id": {"null" if system_id == -1 else system_id}}}\n'
+            )
+
+    def dump_csv(self, file: Path | TextIO):
+        """
+        Writes pages as CSV with header "source,img_id,label,id", missing IDs are left empty.
+
+        :param file: output path or text file object
+        """
+        if isinstance(file, Path):
+            with open(file, "w", encoding="utf8", newline="") as f:
+                self.dump_csv(f)
+            return
+
+        writer = csv.writer(file)
+        writer.writerow(("source", "img_id", "label", "id"))
+        writer.writerows(self._iter_rows())
+
+
 class PageDataEncoder(json.JSONEncoder):
     """
     Encoder for `json` library.
@@ -30,4 +187,6 @@ class PageDataEncoder(json.JSONEncoder):
                 "label": o.label,
                 "id": o.system_id
             }
+        if isinstance(o, PageDataTable):
+            return o.to_records()
         return super().default(o)
@@ -0,0 +1,141 @@
+import atexit
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from seleniumwire import webdriver
+
+SOLR_SEARCH_URL = "https://api.kramerius.mzk.cz/search/api/client/v7.0/search?"
+
+
+def clean_up_captured_query(url: str) -> str:
+    """
+    Strips the search endpoint and paging added by the search page from a captured Solr request url.
+    """
+    return url.replace(SOLR_SEARCH_URL, "").replace("&rows=60&start=0", "")
+
+
+class MZKQueryCapture:
+    """
+    Translates human-readable search URLs into Solr queries by loading them in headless Chrome
+    and capturing the search request sent by the page.
+
+    Browsers are started on first use and kept for later calls, up to `pool_size` of them run at once.
+    Each capture returns as soon as the search request is sent, translated queries are kept in an LRU cache.
+    Call `close` when done to quit the browsers.
+    """
+
+    def __init__(self, pool_size: int = 1, cache_size: int = 1024):
+        """
+        :param pool_size: maximum number of browsers, i.e. of queries captured at once
+        :param cache_size: maximum number of cached translations
+        """
+        self.pool_size = pool_size
+        self.cache_size = cache_size
+
+        # idle browsers, guarded by `_pool_condition` together with the number of running browsers
+        self._drivers: list[webdriver.Chrome] = []
+        self._started = 0
+        self._pool_condition = threading.Condition()
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _create_driver(self) -> webdriver.Chrome:
+        chrome_options = webdriver.ChromeOptions()
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        driver = webdriver.Chrome(options=chrome_options)
+        # record only requests to the search API
+        driver.scopes = [r".*/search/api/client/v7\.0/search.*"]
+        return driver
+
+    def _acquire_driver(self) -> webdriver.Chrome:
+        with self._pool_condition:
+            # wait for an idle browser or for a free slot to start a new one, e.g. after a browser was discarded
+            self._pool_condition.wait_for(lambda: len(self._drivers) > 0 or self._started < self.pool_size)
+            if len(self._drivers) > 0:
+                return self._drivers.pop()
+            self._started += 1
+        try:
+            return self._create_driver()
+        except BaseException:
+            self._free_slot()
+            raise
+
+    def _release_driver(self, driver: webdriver.Chrome):
+        with self._pool_condition:
+            self._drivers.append(driver)
+            self._pool_condition.notify()
+
+    def _discard_driver(self, driver: webdriver.Chrome):
+        try:
+            driver.quit()
+        finally:
+            self._free_slot()
+
+    def _free_slot(self):
+        with self._pool_condition:
+            self._started -= 1
+            self._pool_condition.notify()
+
+    def capture(self, query: str, timeout: float = 3) -> str:
+        """
+        Loads human-readable search URL and returns the Solr query of the search request it triggers.
+
+        :param query: human-readable search solr_query
+        :param timeout: maximum number of seconds to wait for the search request after the page loads
+
+        :raises selenium.common.exceptions.TimeoutException: if no search request is sent within `timeout`
+        """
+        with self._lock:
+            if query in self._cache:
+                self._cache.move_to_end(query)
+                return self._cache[query]
+
+        driver = self._acquire_driver()
+        try:
+            del driver.requests
+            driver.get(query)
+            request = driver.wait_for_request(r"/search/api/client/v7\.0/search\?", timeout=timeout)
+        except BaseException:
+            # browser state is unknown, start a fresh one next time
+            self._discard_driver(driver)
+            raise
+        self._release_driver(driver)
+
+        solr_query = clean_up_captured_query(request.url)
+        with self._lock:
+            self._cache[query] = solr_query
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return solr_query
+
+    def close(self):
+        while True:
+            with self._pool_condition:
+                if len(self._drivers) == 0:
+                    return
+                driver = self._drivers.pop()
+            self._discard_driver(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_default_query_capture: Optional[MZKQueryCapture] = None
+_default_query_capture_lock = threading.Lock()
+
+
+def get_default_query_capture() -> MZKQueryCapture:
+    """
+    Returns query capture shared by the whole process, its browsers are quit at exit.
+    """
+    global _default_query_capture
+    with _default_query_capture_lock:
+        if _default_query_capture is None:
+            _default_query_capture = MZKQueryCapture()
+            atexit.register(_default_query_capture.close)
+        return _default_query_capture
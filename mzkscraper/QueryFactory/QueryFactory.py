@@ -1,45 +1,91 @@
 import datetime
+import functools
+import itertools
 import json
 import urllib.parse
 from pathlib import Path
-from typing import Optional
+from typing import Any, Iterable, Iterator, Optional
 
 from ..Citations import join_non_empty
 
 TEMPLATES_DIR = Path(__file__).parent / "assets"
 
+# digitalniknihovna.cz joins multiple values of a single search parameter with this separator
+HM_VALUE_SEPARATOR = ",,"
+HM_LIST_PARAMETERS = (
+    "keywords", "authors", "languages", "licences", "locations", "publishers", "places", "genres", "doctypes", "geonames",
+)
+
+# maximum number of memoized fragments of each kind
+FRAGMENT_CACHE_SIZE = 4096
+
+# observed from API calls
+OTHERS_PREFIXES = {
+    "places": "publication_places.search:",
+    "publishers": "publishers.search:",
+    "locations": "physical_locations.facet:",
+    "languages": "languages.facet:",
+    "keywords": "keywords.facet:",
+    "authors": "authors.facet:",
+    "geonames": "geographic_names.search:",
+    "genres": "genres.search:",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _load_asset(name: str) -> dict[str, str]:
+    # read once per process
+    with open(TEMPLATES_DIR / name, "r", encoding="utf8") as f:
+        return json.load(f)
+
+
+@functools.lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _quote(part: str) -> str:
+    # quote_plus encodes character by character, so quoted parts can be joined by quoted separators
+    return urllib.parse.quote_plus(part, safe="()=:&")
+
+
+def _as_tuple(values: Optional[list[str] | str]) -> Optional[tuple[str, ...]]:
+    if values is None:
+        return None
+    if isinstance(values, str):
+        return (values,)
+    return tuple(values)
+
 
 class SolrQueryFactory:
     def __init__(self):
         self.query_base = "(model:monograph OR model:periodical OR (model:collection AND collection.is_standalone:true) OR model:graphic OR model:map OR model:sheetmusic OR model:soundrecording OR model:archive OR model:manuscript OR model:convolute OR model:monographunit)"
         self.text_query_base = "_query_:\"{!edismax qf='titles.search^10 authors.search^2 keywords.search text_ocr^0.1 id_isbn shelf_locators' bq='(level:0)^200' bq='(model:page)^0.1' v=$q1}\""
 
-        with open(TEMPLATES_DIR / "access_tags.json", "r", encoding="utf8") as f:
-            self.access: dict[str, str] = json.load(f)
-
-        with open(TEMPLATES_DIR /  "doctypes_formatting.json", "r", encoding="utf8") as f:
-            self.doctypes: dict[str, str] = json.load(f)
-
-        with open(TEMPLATES_DIR / "licences_tags.json", "r", encoding="utf8") as f:
-            self.licences: dict[str, str] = json.load(f)
+        # every factory gets its own copy of the assets, which are read from disk only once per process
+        self.access: dict[str, str] = dict(_load_asset("access_tags.json"))
+        self.doctypes: dict[str, str] = dict(_load_asset("doctypes_formatting.json"))
+        self.licences: dict[str, str] = dict(_load_asset("licences_tags.json"))
 
-    def _get_licence_part(self, licences: list[str]) -> str:
+    def _get_licence_part(self, licences: Iterable[str]) -> str:
         return join_non_empty("OR", [
             self.licences[l] for l in licences
         ])
 
-    def _get_doctype_part(self, doctypes: list[str]) -> str:
+    def _get_doctype_part(self, doctypes: Iterable[str]) -> str:
         return join_non_empty(" OR ", [
             self.doctypes[d] for d in doctypes
         ])
 
     @staticmethod
-    def _get_others_part(prefix: str, others: list[str]) -> str:
+    def _get_others_part(prefix: str, others: Iterable[str]) -> str:
+        return SolrQueryFactory._build_others_part(prefix, tuple(others))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+    def _build_others_part(prefix: str, others: tuple[str, ...]) -> str:
         return join_non_empty(" AND ", [
             f'({prefix}"{other}")' for other in others
         ])
 
     @staticmethod
+    @functools.lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
     def _get_date_part(published_from: int | str, published_to: int | str) -> str:
         return f"((date_range_start.year:[* TO {published_to}] AND date_range_end.year:[{published_from} TO *]))"
 
@@ -62,69 +108,118 @@ class SolrQueryFactory:
             geonames: Optional[list[str] | str] = None,
             genres: Optional[list[str] | str] = None
     ) -> str:
-        if isinstance(licences, str):
-            licences = [licences]
-        if isinstance(doctypes, str):
-            doctypes = [doctypes]
-
-        if isinstance(places, str):
-            places = [places]
-        if isinstance(publishers, str):
-            publishers = [publishers]
-        if isinstance(locations, str):
-            locations = [locations]
-        if isinstance(languages, str):
-            languages = [languages]
-        if isinstance(keywords, str):
-            keywords = [keywords]
-        if isinstance(authors, str):
-            authors = [authors]
-        if isinstance(geonames, str):
-            geonames = [geonames]
-        if isinstance(genres, str):
-            genres = [genres]
+        licences = _as_tuple(licences)
+        doctypes = _as_tuple(doctypes)
+        others = {
+            "places": places,
+            "publishers": publishers,
+            "locations": locations,
+            "languages": languages,
+            "keywords": keywords,
+            "authors": authors,
+            "geonames": geonames,
+            "genres": genres,
+        }
 
         if published_from is None:
             published_from = 0
         if published_to is None:
             published_to = datetime.datetime.now().year
 
-        return (
-            urllib.parse.quote_plus(
-                join_non_empty(
-                    "&",
-                    [
-                        # text query necessity, probably defines priorities for search parameters
-                        ("q=" + self.text_query_base) if text_query is not None else "q=*:*",
-                        "fq=(" + join_non_empty(" AND ", [
-                            # does not seem to do anything, but removing it causes errors
-                            self.query_base,
-                            # access
-                            self.access[access] if access is not None else "",
-                            # licences
-                            ("(" + self._get_licence_part(licences) + ")") if licences is not None else "",
-                            # doctypes
-                            ("(" + self._get_doctype_part(doctypes) + ")") if doctypes is not None else "",
-                            # others
-                            self._get_date_part(published_from,
-                                                published_to) if published_from is not None else "",
-
-                            *[
-                                SolrQueryFactory._get_others_part(prefix, data) for prefix, data in [
-                                    # observed from API calls
-                                    ("publication_places.search:", places),
-                                    ("publishers.search:", publishers),
-                                    ("physical_locations.facet:", locations),
-                                    ("languages.facet:", languages),
-                                    ("keywords.facet:", keywords),
-                                    ("authors.facet:", authors),
-                                    ("geographic_names.search:", geonames),
-                                    ("genres.search:", genres),
-                                ] if data is not None
-                            ]
-                        ]) + ")",
-                        # text query
-                        ("q1=" + text_query) if text_query is not None else "",
-                    ]
-                ), safe="()=:&")
+        # every fragment is built and quoted once, repeated queries only join cached strings
+        fq_parts = [
+            # does not seem to do anything, but removing it causes errors
+            _quote(self.query_base),
+            # access
+            _quote(self.access[access]) if access is not None else "",
+            # licences
+            _quote("(" + self._get_licence_part(licences) + ")") if licences is not None else "",
+            # doctypes
+            _quote("(" + self._get_doctype_part(doctypes) + ")") if doctypes is not None else "",
+            # others
+            _quote(SolrQueryFactory._get_date_part(published_from, published_to)) if published_from is not None else "",
+            *[
+                _quote(SolrQueryFactory._build_others_part(OTHERS_PREFIXES[name], _as_tuple(data)))
+                for name, data in others.items() if data is not None
+            ],
+        ]
+
+        return join_non_empty(
+            "&",
+            [
+                # text query necessity, probably defines priorities for search parameters
+                _quote("q=" + self.text_query_base) if text_query is not None else _quote("q=*:*"),
+                _quote("fq=(") + join_non_empty(_quote(" AND "), fq_parts) + _quote(")"),
+                # text query
+                urllib.parse.quote_plus("q1=" + text_query, safe="()=:&") if text_query is not None else "",
+            ]
         )
+
+    def create_queries(self, grid: dict[str, Iterable[Any]]) -> Iterator[tuple[dict[str, Any], str]]:
+        """
+        Creates a query for every combination of parameter values, see `create_query` for parameters.
+        Fragments shared by the combinations are built only once.
+
+        For example `{"authors": ["A", "B"], "published_from": [1900, 1950]}` creates four queries.
+
+        :param grid: parameter name to all its values
+        :return: yields parameters of each combination together with its query
+        """
+        names = list(grid.keys())
+        for values in itertools.product(*(list(grid[name]) for name in names)):
+            kwargs = dict(zip(names, values))
+            yield kwargs, self.create_query(**kwargs)
+
+    def parse_hm_query(self, query: str) -> Optional[dict]:
+        """
+        Reads parameters of a human-readable search URL, see `MZKScraper.construct_hm_query`,
+        into keyword arguments of `create_query`.
+        Returns None if the URL contains a parameter or a value that `create_query` cannot express.
+
+        :param query: human-readable search URL
+        """
+        parameters = urllib.parse.parse_qs(urllib.parse.urlsplit(query).query, keep_blank_values=True)
+
+        kwargs = {}
+        for name, values in parameters.items():
+            if len(values) != 1:
+                return None
+            value = values[0]
+            if value == "":
+                continue
+
+            if name in HM_LIST_PARAMETERS:
+                kwargs[name] = [v for v in value.split(HM_VALUE_SEPARATOR) if v != ""]
+            elif name == "text_query":
+                kwargs[name] = value
+            elif name == "access":
+                if value == "all":
+                    continue
+                if value not in self.access:
+                    return None
+                kwargs[name] = value
+            elif name in ("published_from", "published_to"):
+                try:
+                    kwargs[name] = int(value)
+                except ValueError:
+                    return None
+            else:
+                return None
+
+        if any(d not in self.doctypes for d in kwargs.get("doctypes", [])):
+            return None
+        if any(l not in self.licences for l in kwargs.get("licences", [])):
+            return None
+        return kwargs
+
+    def create_query_from_hm_query(self, query: str) -> Optional[str]:
+        """
+        Translates human-readable search URL into Solr query without contacting MZK.
+        Returns None if the URL cannot be translated, see `parse_hm_query`.
+
+        :param query: human-readable search URL
+        """
+        kwargs = self.parse_hm_query(query)
+        if kwargs is None:
+            return None
+        return self.create_query(**kwargs)
@@ -0,0 +1,245 @@
+import asyncio
+import threading
+import time
+import urllib.parse
+from typing import Optional
+
+
+def get_endpoint(url: str) -> str:
+    """
+    Returns host and path of url up to the first UUID, requests to the same endpoint are expected to take similar time.
+    Solr queries that only count documents (`rows=0`) are told apart from queries that return them.
+    """
+    parts = urllib.parse.urlsplit(url)
+    endpoint = parts.netloc + parts.path.split("uuid:")[0]
+    if "rows=0" in parts.query.split("&"):
+        endpoint += "?rows=0"
+    return endpoint
+
+
+class TokenBucket:
+    """
+    Limits the average rate of requests while allowing short bursts.
+
+    Tokens are refilled at `rate` per second up to `burst`, every request takes one.
+    A request that finds the bucket empty reserves a future token and waits until it is refilled.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        :param rate: number of tokens refilled per second
+        :param burst: maximum number of tokens in the bucket
+        """
+        self.rate = rate
+        self.burst = burst
+
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes one token and returns number of seconds to wait before it may be used.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            return 0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class AIMDController:
+    """
+    Decides how many requests may be in flight at once, using additive increase and multiplicative decrease.
+
+    The limit grows by `increase` per round trip while responses are healthy, i.e. without errors and
+    with latency below `latency_tolerance` times the baseline latency of their endpoint or below `latency_floor`.
+    Latency and baseline are kept per endpoint, so fast responses of a cheap endpoint do not make a slower
+    endpoint unhealthy. The baseline follows the lowest recent latency: it drops at once to a lower latency
+    and rises slowly to a higher one, so a single fast response is forgotten after a while.
+    An error or an unhealthy latency multiplies the limit by `decrease_factor`, at most once per round trip,
+    so a burst of failures from requests sent at the same time counts as a single signal.
+    """
+
+    def __init__(
+            self,
+            initial_limit: float = 4,
+            min_limit: float = 1,
+            max_limit: float = 64,
+            increase: float = 1,
+            decrease_factor: float = 0.5,
+            latency_tolerance: float = 2.5,
+            latency_floor: float = 0.5,
+            baseline_decay: float = 0.01,
+    ):
+        """
+        :param initial_limit: number of requests in flight at start
+        :param min_limit: lower bound of the limit
+        :param max_limit: upper bound of the limit
+        :param increase: how much the limit grows per round trip of healthy responses
+        :param decrease_factor: what the limit is multiplied by after an error or a latency rise
+        :param latency_tolerance: how many times the baseline latency a response may take to be healthy
+        :param latency_floor: number of seconds under which latency is always healthy,
+            keeps jitter of very fast responses from counting as overload
+        :param baseline_decay: fraction of the gap between the smoothed latency and the baseline
+            by which the baseline rises with every response
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.latency_floor = latency_floor
+        self.baseline_decay = baseline_decay
+
+        self._limit = float(initial_limit)
+        # endpoint -> smoothed latency and baseline latency
+        self._latency: dict[Optional[str], float] = {}
+        self._baseline_latency: dict[Optional[str], float] = {}
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return max(int(self._limit), 1)
+
+    def on_response(self, latency: float, error: bool, endpoint: Optional[str] = None):
+        """
+        Updates the limit with the outcome of a single request.
+
+        :param latency: number of seconds the request took
+        :param error: whether the request failed or was refused by the server
+        :param endpoint: endpoint of the request, see `get_endpoint`; None if unknown
+        """
+        with self._lock:
+            overloaded = error
+            smoothed = self._latency.get(endpoint)
+            if not error:
+                # exponentially weighted average smooths out single slow responses
+                smoothed = latency if smoothed is None else 0.9 * smoothed + 0.1 * latency
+                self._latency[endpoint] = smoothed
+                baseline = self._baseline_latency.get(endpoint)
+                if baseline is None or smoothed < baseline:
+                    baseline = smoothed
+                else:
+                    baseline += self.baseline_decay * (smoothed - baseline)
+                self._baseline_latency[endpoint] = baseline
+                overloaded = smoothed > max(self.latency_tolerance * baseline, self.latency_floor)
+
+            now = time.monotonic()
+            if overloaded:
+                if now - self._last_decrease > (smoothed or 0):
+                    self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                    self._last_decrease = now
+            else:
+                self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+
+
+class RateLimiter:
+    """
+    Gate that every request of a `MZKTransport` passes through, one instance can be shared by several transports.
+
+    Combines a `TokenBucket`, which bounds the number of requests per second,
+    with an `AIMDController`, which bounds the number of requests in flight and adapts to the server's responses.
+    """
+
+    def __init__(
+            self,
+            rate: Optional[float] = 20,
+            burst: int = 10,
+            controller: Optional[AIMDController] = None,
+    ):
+        """
+        :param rate: maximum average number of requests per second, None for no limit
+        :param burst: number of requests that may be sent at once above the rate
+        :param controller: concurrency controller, new one with default settings is created if None
+        """
+        self.bucket = TokenBucket(rate, burst) if rate is not None else None
+        self.controller = controller if controller is not None else AIMDController()
+
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Waits until a request may be sent, every `acquire` has to be followed by `release`.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < self.controller.limit)
+            self._in_flight += 1
+
+        if self.bucket is not None:
+            wait = self.bucket.reserve()
+            if wait > 0:
+                time.sleep(wait)
+
+    def release(self, latency: float, error: bool, endpoint: Optional[str] = None):
+        """
+        Frees the slot taken by `acquire` and reports the outcome of the request.
+
+        :param latency: number of seconds the request took
+        :param error: whether the request failed or was refused by the server
+        :param endpoint: endpoint of the request, see `get_endpoint`; None if unknown
+        """
+        self.controller.on_response(latency, error, endpoint)
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+
+class AsyncRateLimiter:
+    """
+    Asynchronous counterpart of `RateLimiter` for `AsyncMZKTransport`, has to be used from a single event loop.
+    """
+
+    def __init__(
+            self,
+            rate: Optional[float] = 20,
+            burst: int = 10,
+            controller: Optional[AIMDController] = None,
+    ):
+        """
+        :param rate: maximum average number of requests per second, None for no limit
+        :param burst: number of requests that may be sent at once above the rate
+        :param controller: concurrency controller, new one with default settings is created if None
+        """
+        self.bucket = TokenBucket(rate, burst) if rate is not None else None
+        self.controller = controller if controller is not None else AIMDController()
+
+        self._in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # created lazily, so that it binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        """
+        Waits until a request may be sent, every `acquire` has to be followed by `release`.
+        """
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self._in_flight < self.controller.limit)
+            self._in_flight += 1
+
+        if self.bucket is not None:
+            wait = self.bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    async def release(self, latency: float, error: bool, endpoint: Optional[str] = None):
+        """
+        Frees the slot taken by `acquire` and reports the outcome of the request.
+
+        :param latency: number of seconds the request took
+        :param error: whether the request failed or was refused by the server
+        :param endpoint: endpoint of the request, see `get_endpoint`; None if unknown
+        """
+        self.controller.on_response(latency, error, endpoint)
+        condition = self._get_condition()
+        async with condition:
+            self._in_flight -= 1
+            condition.notify_all()
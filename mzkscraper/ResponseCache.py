@@ -0,0 +1,154 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+# url substring -> time to live in seconds
+DEFAULT_TTLS = {
+    "/search?": 24 * 60 * 60,
+    "/metadata/mods": 30 * 24 * 60 * 60,
+    "iiif.digitalniknihovna.cz/mzk/uuid:": 30 * 24 * 60 * 60,
+}
+
+
+class CacheEntry:
+    """
+    Keeps a single cached response body together with its validators.
+    """
+
+    def __init__(self, body: bytes, etag: Optional[str], last_modified: Optional[str], stored_at: float):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+
+class ResponseCache:
+    """
+    Persistent cache of response bodies keyed by url, stored in a single SQLite file.
+
+    Only urls that contain one of the keys of `ttls` are cached, the longest matching key decides
+    how long the entry is considered fresh. Stale entries are kept, so that they can be revalidated
+    using their `ETag` and `Last-Modified` headers.
+    When the total size of stored bodies exceeds `max_bytes`, least recently used entries are evicted.
+    The cache can be shared by multiple threads and processes.
+    """
+
+    def __init__(
+            self,
+            path: Path,
+            ttls: Optional[dict[str, float]] = None,
+            max_bytes: Optional[int] = 1024 ** 3,
+    ):
+        """
+        :param path: path to the SQLite database, created if it does not exist
+        :param ttls: url substring to time to live in seconds, defaults to `DEFAULT_TTLS`
+        :param max_bytes: maximum total size of cached bodies, None for no limit
+        """
+        self.path = path
+        self.ttls = ttls if ttls is not None else DEFAULT_TTLS
+        self.max_bytes = max_bytes
+
+        path.parent.mkdir(exist_ok=True, parents=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, last_modified TEXT, "
+            "stored_at REAL NOT NULL, last_access REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+
+    def get_ttl(self, url: str) -> Optional[float]:
+        """
+        Returns time to live for given url or None, if the url should not be cached.
+        """
+        matches = [key for key in self.ttls if key in url]
+        if len(matches) == 0:
+            return None
+        return self.ttls[max(matches, key=len)]
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """
+        Returns cached entry for given url, fresh or stale, or None if the url is not cached.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, etag, last_modified, stored_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+        return CacheEntry(*row)
+
+    def is_fresh(self, url: str, entry: CacheEntry) -> bool:
+        ttl = self.get_ttl(url)
+        return ttl is not None and time.time() - entry.stored_at < ttl
+
+    def store(self, url: str, body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        Stores response body and its validators, evicts least recently used entries if over budget.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, now, now, len(body)),
+            )
+            self._evict()
+
+    def refresh(self, url: str):
+        """
+        Marks cached entry as fresh again, used after successful revalidation.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE responses SET stored_at = ?, last_access = ? WHERE url = ?", (now, now, url)
+            )
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        to_delete = []
+        for url, size in self._connection.execute("SELECT url, size FROM responses ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            to_delete.append((url,))
+            total -= size
+        self._connection.executemany("DELETE FROM responses WHERE url = ?", to_delete)
+
+    def iter_entries(self, url_part: str) -> Iterator[tuple[str, bytes]]:
+        """
+        Yields url and body of every cached response whose url contains `url_part`, fresh or stale.
+        """
+        with self._lock:
+            urls = [row[0] for row in self._connection.execute(
+                "SELECT url FROM responses WHERE instr(url, ?) > 0 ORDER BY rowid", (url_part,)
+            )]
+        for url in urls:
+            with self._lock:
+                row = self._connection.execute("SELECT body FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is not None:
+                yield url, row[0]
+
+    def size(self) -> int:
+        """
+        Returns total size of cached bodies in bytes.
+        """
+        with self._lock:
+            return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
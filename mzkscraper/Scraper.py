@@ -1,25 +1,38 @@
 import datetime
-import time
+import os
+import tempfile
+import threading
 import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import BytesIO
 from pathlib import Path
-from typing import Callable, Optional, Literal
+from typing import Callable, Iterable, Iterator, Optional, Literal
 
 import inflection
-import requests
-from PIL import Image
-from seleniumwire import webdriver
+from PIL import Image, ImageFile
 from tqdm import tqdm
 
 from . import ScraperUtils
+from .Citations.PageNumberIndex import PageNumberIndex
+from .DownloadResult import DownloadResult
 from .MZKBase import MZKBase
-from .PageData import PageData
+from .PageData import PageData, PageDataTable
+from .QueryCapture import clean_up_captured_query, get_default_query_capture
 from .QueryFactory import SolrQueryFactory
+from .SearchHit import SEARCH_HIT_FIELDS, SearchHit
+from .Transport import MZKTransport
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PAGE_BATCH_SIZE = 500
 
 
 class MZKScraper(MZKBase):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, transport: Optional[MZKTransport] = None):
+        """
+        :param transport: transport used for all requests, shared default transport is used if None
+        """
+        super().__init__(transport)
         self.query_factory = SolrQueryFactory()
 
     def retrieve_document_ids_by_solr_query(
@@ -27,14 +40,55 @@ class MZKScraper(MZKBase):
             query: str,
             requested_document_count: int | Literal["all"] = "all",
             batch_size: int = 100,
+            workers: int = 4,
     ) -> list[str]:
         """
         Search documents by Solr solr_query in MZK.
 
+        Number of available documents is known before the first batch is requested,
+        so all batches are requested concurrently and joined in the original order.
+
         :param query: search solr_query in Solr format
         :param requested_document_count: requested number of pages, "all" for all documents
         :param batch_size: batch size, defaults to 100; this many documents will be requested at once
+        :param workers: number of batches requested at once, defaults to 4
         """
+        return [
+            doc["pid"][5:]
+            for doc in self._retrieve_documents(query, requested_document_count, batch_size, workers, fl=("pid",))
+        ]
+
+    def retrieve_search_hits_by_solr_query(
+            self,
+            query: str,
+            requested_document_count: int | Literal["all"] = "all",
+            batch_size: int = 100,
+            workers: int = 4,
+            fl: Iterable[str] = SEARCH_HIT_FIELDS,
+    ) -> list[SearchHit]:
+        """
+        Search documents by Solr solr_query in MZK and return basic information about each of them,
+        without requesting their metadata one by one.
+
+        :param query: search solr_query in Solr format
+        :param requested_document_count: requested number of pages, "all" for all documents
+        :param batch_size: batch size, defaults to 100; this many documents will be requested at once
+        :param workers: number of batches requested at once, defaults to 4
+        :param fl: Solr fields to return, fields other than those of `SearchHit` are kept in `SearchHit.fields`
+        """
+        return [
+            SearchHit.from_solr_doc(doc)
+            for doc in self._retrieve_documents(query, requested_document_count, batch_size, workers, fl=fl)
+        ]
+
+    def _retrieve_documents(
+            self,
+            query: str,
+            requested_document_count: int | Literal["all"],
+            batch_size: int,
+            workers: int,
+            fl: Iterable[str],
+    ) -> list[dict]:
         # set number of document ids to retrieve
         total_document_count = self._get_number_of_documents_available(query)
         if requested_document_count == "all":
@@ -42,42 +96,287 @@ class MZKScraper(MZKBase):
         else:
             to_retrieve = min(total_document_count, requested_document_count)
 
+        field_list = MZKScraper._get_field_list_part(fl)
+
+        def retrieve_batch(offset: int) -> list[dict]:
+            result = ScraperUtils.get_json_from_url(
+                self.solr_search_url + query + field_list
+                + f"&rows={min(batch_size, to_retrieve - offset)}&start={offset}",
+                transport=self.transport,
+            )
+            assert result is not None
+            return result["response"]["docs"]
+
         # retrieve documents in batches
-        output = []
+        offsets = range(0, to_retrieve, batch_size)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            batches = list(tqdm(executor.map(retrieve_batch, offsets), total=len(offsets)))
+
+        return [doc for batch in batches for doc in batch]
+
+    @staticmethod
+    def _get_field_list_part(fl: Iterable[str]) -> str:
+        return "&fl=" + urllib.parse.quote(",".join(fl), safe=",")
+
+    def iter_document_ids(
+            self,
+            query: str,
+            requested_document_count: int | Literal["all"] = "all",
+            batch_size: int = 100,
+            batched: bool = False,
+            use_cursor: bool = False,
+    ) -> Iterator[str] | Iterator[list[str]]:
+        """
+        Search documents by Solr solr_query in MZK and yield their IDs as soon as each batch arrives.
+        Only a single batch is kept in memory, so processing of the first IDs can start after one request.
+
+        :param query: search solr_query in Solr format
+        :param requested_document_count: requested number of pages, "all" for all documents
+        :param batch_size: batch size, defaults to 100; this many documents will be requested at once
+        :param batched: if True, yields lists of IDs as they were received instead of single IDs
+        :param use_cursor: if True, uses `cursorMark` paging, see `iter_document_ids_by_cursor`
+        """
+        for docs in self._iter_documents(query, requested_document_count, batch_size, ("pid",), use_cursor):
+            doc_ids = [doc["pid"][5:] for doc in docs]
+            if batched:
+                yield doc_ids
+            else:
+                yield from doc_ids
+
+    def iter_search_hits(
+            self,
+            query: str,
+            requested_document_count: int | Literal["all"] = "all",
+            batch_size: int = 100,
+            fl: Iterable[str] = SEARCH_HIT_FIELDS,
+            use_cursor: bool = False,
+    ) -> Iterator[SearchHit]:
+        """
+        Search documents by Solr solr_query in MZK and yield basic information about each of them
+        as soon as each batch arrives.
+
+        :param query: search solr_query in Solr format
+        :param requested_document_count: requested number of pages, "all" for all documents
+        :param batch_size: batch size, defaults to 100; this many documents will be requested at once
+        :param fl: Solr fields to return, fields other than those of `SearchHit` are kept in `SearchHit.fields`
+        :param use_cursor: if True, uses `cursorMark` paging, see `iter_document_ids_by_cursor`
+        """
+        for docs in self._iter_documents(query, requested_document_count, batch_size, fl, use_cursor):
+            for doc in docs:
+                yield SearchHit.from_solr_doc(doc)
+
+    def _iter_documents(
+            self,
+            query: str,
+            requested_document_count: int | Literal["all"],
+            batch_size: int,
+            fl: Iterable[str],
+            use_cursor: bool,
+    ) -> Iterator[list[dict]]:
+        """
+        Yields batches of Solr documents, stops after `requested_document_count` documents.
+        """
+        if use_cursor:
+            batches = (docs for docs, _ in self._iter_document_batches_by_cursor(query, batch_size, "*", fl))
+        else:
+            batches = self._iter_document_batches_by_offset(query, batch_size, fl)
+
+        remaining = requested_document_count
+        for docs in batches:
+            if remaining != "all":
+                docs = docs[:remaining]
+                remaining -= len(docs)
+
+            if len(docs) > 0:
+                yield docs
+
+            if remaining != "all" and remaining <= 0:
+                return
+
+    def _iter_document_batches_by_offset(self, query: str, batch_size: int, fl: Iterable[str]) -> Iterator[list[dict]]:
+        """
+        Yields batches of Solr documents using `start` offset paging,
+        total number of documents is read from the first response.
+        """
+        field_list = MZKScraper._get_field_list_part(fl)
+
         offset = 0
-        for _ in tqdm(range(to_retrieve // batch_size + 1)):
-            if to_retrieve <= 0:
-                break
+        total_document_count = None
+        while total_document_count is None or offset < total_document_count:
+            result = ScraperUtils.get_json_from_url(
+                self.solr_search_url + query + field_list + f"&rows={batch_size}&start={offset}",
+                transport=self.transport,
+            )
+            assert result is not None
+
+            total_document_count = int(result["response"]["numFound"])
+            docs = result["response"]["docs"]
+            if len(docs) == 0:
+                return
 
-            # request ids
+            offset += len(docs)
+            yield docs
+
+    def iter_document_ids_by_cursor(
+            self,
+            query: str,
+            batch_size: int = 100,
+            cursor_mark: str = "*",
+    ) -> Iterator[tuple[list[str], str]]:
+        """
+        Iterates over all documents matching Solr solr_query using Solr's `cursorMark` deep paging.
+
+        Unlike offset paging, every batch costs the same no matter how deep into results it is,
+        and documents are neither skipped nor repeated when the index changes during iteration.
+        Results are sorted by `pid`, the query must not contain its own `sort`.
+
+        Yields batches of document IDs together with cursor mark pointing after the batch,
+        pass the last seen cursor mark as `cursor_mark` to resume interrupted iteration.
+
+        :param query: search solr_query in Solr format
+        :param batch_size: batch size, defaults to 100; this many documents will be requested at once
+        :param cursor_mark: cursor mark to start from, "*" starts from the beginning
+        """
+        for docs, next_cursor_mark in self._iter_document_batches_by_cursor(query, batch_size, cursor_mark, ("pid",)):
+            yield [doc["pid"][5:] for doc in docs], next_cursor_mark
+
+    def _iter_document_batches_by_cursor(
+            self,
+            query: str,
+            batch_size: int,
+            cursor_mark: str,
+            fl: Iterable[str],
+    ) -> Iterator[tuple[list[dict], str]]:
+        if "sort=" in query:
+            raise ValueError("Cursor paging requires sorting by pid, remove 'sort' from the query")
+
+        field_list = MZKScraper._get_field_list_part(fl)
+
+        while True:
             result = ScraperUtils.get_json_from_url(
-                "https://api.kramerius.mzk.cz/search/api/client/v7.0/search?"
-                + query
-                + f"&rows={min(batch_size, to_retrieve)}&start={offset}"
+                self.solr_search_url + query + field_list
+                + f"&sort=pid%20asc&rows={batch_size}&cursorMark={urllib.parse.quote_plus(cursor_mark)}",
+                transport=self.transport,
             )
             assert result is not None
 
-            for doc in result["response"]["docs"]:
-                output.append(doc["pid"][5:])
-                offset += 1
-                to_retrieve -= 1
+            next_cursor_mark = result["nextCursorMark"]
+            docs = result["response"]["docs"]
+            if len(docs) > 0:
+                yield docs, next_cursor_mark
 
-        return output
+            # Solr returns the same cursor mark once all documents were retrieved
+            if next_cursor_mark == cursor_mark:
+                return
+            cursor_mark = next_cursor_mark
 
-    @staticmethod
-    def _get_number_of_documents_available(query: str) -> int:
+    def _get_number_of_documents_available(self, query: str) -> int:
         """
         Returns the number of documents available in MZK based on Solr solr_query.
 
         :param query: Solr solr_query
         """
         result = ScraperUtils.get_json_from_url(
-            "https://api.kramerius.mzk.cz/search/api/client/v7.0/search?" + query + "&rows=0&start=0"
+            self.solr_search_url + query + "&rows=0&start=0",
+            transport=self.transport,
         )
         assert result is not None
 
         return int(result["response"]["numFound"])
 
+    def plan_year_slices(
+            self,
+            max_documents: int = 10_000,
+            published_from: int = 0,
+            published_to: Optional[int] = None,
+            workers: int = 4,
+            **query_params,
+    ) -> list[tuple[int, int, int]]:
+        """
+        Splits year range of a search into slices of at most `max_documents` documents,
+        by halving every range that has more. A single year is never split, even if it has more documents.
+        Ranges of the same depth are counted concurrently.
+
+        :param max_documents: maximum number of documents in a slice
+        :param published_from: first year of the range
+        :param published_to: last year of the range, defaults to current year
+        :param workers: number of counts requested at once
+        :param query_params: other parameters of `construct_solr_query_with_qf`
+
+        :return: (first year, last year, number of documents) of every non-empty slice, in ascending order
+        """
+        if published_to is None:
+            published_to = datetime.datetime.now().year
+
+        def count(year_range: tuple[int, int]) -> int:
+            return self._get_number_of_documents_available(self.construct_solr_query_with_qf(
+                published_from=year_range[0],
+                published_to=year_range[1],
+                **query_params,
+            ))
+
+        slices = []
+        level = [(published_from, published_to)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while len(level) > 0:
+                next_level = []
+                for (start, end), document_count in zip(level, executor.map(count, level)):
+                    if document_count == 0:
+                        continue
+                    if document_count <= max_documents or start == end:
+                        slices.append((start, end, document_count))
+                    else:
+                        middle = (start + end) // 2
+                        next_level += [(start, middle), (middle + 1, end)]
+                level = next_level
+
+        return sorted(slices)
+
+    def retrieve_document_ids_by_year_slices(
+            self,
+            max_documents: int = 10_000,
+            published_from: int = 0,
+            published_to: Optional[int] = None,
+            batch_size: int = 100,
+            workers: int = 4,
+            **query_params,
+    ) -> list[str]:
+        """
+        Search documents in MZK by splitting the year range into slices, see `plan_year_slices`,
+        and retrieving the slices concurrently. Keeps every Solr request small even for very wide searches.
+
+        :param max_documents: maximum number of documents in a slice
+        :param published_from: first year of the range
+        :param published_to: last year of the range, defaults to current year
+        :param batch_size: batch size, defaults to 100; this many documents will be requested at once
+        :param workers: number of slices retrieved at once
+        :param query_params: other parameters of `construct_solr_query_with_qf`
+
+        :return: IDs of documents, ordered by slices, each ID only once
+        """
+        slices = self.plan_year_slices(max_documents, published_from, published_to, workers, **query_params)
+
+        def retrieve_slice(year_slice: tuple[int, int, int]) -> list[str]:
+            query = self.construct_solr_query_with_qf(
+                published_from=year_slice[0],
+                published_to=year_slice[1],
+                **query_params,
+            )
+            return self.retrieve_document_ids_by_solr_query(query, batch_size=batch_size, workers=1)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(retrieve_slice, slices))
+
+        # documents dated by a range of years match every slice the range overlaps
+        seen = set()
+        doc_ids = []
+        for result in results:
+            for doc_id in result:
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    doc_ids.append(doc_id)
+        return doc_ids
+
     def construct_solr_query_with_qf(
             self,
             text_query=None,
@@ -162,37 +461,35 @@ class MZKScraper(MZKBase):
             }
         )
 
+    def transform_query_from_hm_to_solr(self, query: str, timeout: int = 3) -> str:
+        """
+        Translates human-readable search URL into Solr query.
+        Queries that `SolrQueryFactory` can express are translated locally, without any request,
+        others are translated by MZK search page, see `transform_query_from_hm_to_solr_using_mzk`.
+
+        :param query: human-readable search solr_query
+        :param timeout: timeout in seconds for the search page, defaults to 3
+        """
+        solr_query = self.query_factory.create_query_from_hm_query(query)
+        if solr_query is not None:
+            return solr_query
+        return MZKScraper.transform_query_from_hm_to_solr_using_mzk(query, timeout)
+
     @staticmethod
     def transform_query_from_hm_to_solr_using_mzk(query: str, timeout: int = 3) -> str:
         """
         Dynamically loads MZK search page, triggering an XHR request that includes the wanted Solr search solr_query.
+        The browser is shared by all calls in the process and translated queries are cached,
+        see `MZKQueryCapture`.
 
         :param query: human-readable search solr_query
-        :param timeout: timeout in seconds, defaults to 3
+        :param timeout: maximum number of seconds to wait for the request after the page loads, defaults to 3
         """
-        chrome_options = webdriver.ChromeOptions()
-        chrome_options.add_argument('--headless')
-        driver = webdriver.Chrome(options=chrome_options)
-
-        try:
-            # load page and wait a bit
-            driver.get(query)
-            time.sleep(timeout)
-
-            # listen to XHR requests
-            for request in driver.requests:
-                if request.response and "https://api.kramerius.mzk.cz/search/api/client/v7.0/search" in request.url:
-                    driver.quit()
-                    return MZKScraper._clean_up_query(request.url)
-        except Exception as e:
-            driver.quit()
-            raise
-        raise RuntimeError()
+        return get_default_query_capture().capture(query, timeout)
 
     @staticmethod
     def _clean_up_query(query: str) -> str:
-        return query.replace("https://api.kramerius.mzk.cz/search/api/client/v7.0/search?", "").replace(
-            "&rows=60&start=0", "")
+        return clean_up_captured_query(query)
 
     @staticmethod
     def _strip_page_label(label: str) -> str:
@@ -205,6 +502,9 @@ class MZKScraper(MZKBase):
             valid_labels: Optional[list[str]] = None,
             label_preprocessing: Optional[Callable[[str], str]] = None,
             label_formatting: Callable[[str], str] = inflection.underscore,
+            page_batch_size: int = PAGE_BATCH_SIZE,
+            konvolut_workers: int = 4,
+            page_index: Optional[PageNumberIndex] = None,
     ) -> list[PageData] | None:
         """
         Sends request to MZK using IIIF and parses information about all pages inside a document.
@@ -214,53 +514,353 @@ class MZKScraper(MZKBase):
         :param valid_labels: list of valid labels strings, if None all labels are valid
         :param label_preprocessing: function that takes text retrieved from IIIF call and returns preprocessed label
         :param label_formatting: function that takes label and returns formatted label
+        :param page_batch_size: number of pages listed by a single request
+        :param konvolut_workers: number of sub-documents of a Konvolut listed at once
+        :param page_index: if given, page numbers of the document are stored in it from the listing,
+            pass the `page_index` of a citation generator to cite the pages without another request
 
         :return: List of `ImageData` objects or None, if request fails
         """
-        page_data = ScraperUtils.get_json_from_url(self.list_pages_solr.format(doc_id=doc_id))
+        page_datas = self._iter_page_listing(doc_id, page_batch_size)
+        if page_index is not None:
+            page_datas = MZKScraper._index_page_listing(page_datas, doc_id, page_index)
 
-        if page_data is None:
-            return None
-        
-        def is_konvolut(page_data: dict[str, dict]) -> bool:
-            return all(sheet.get("page.number") is None for sheet in page_data["response"]["docs"])
+        return self._process_page_listing(
+            page_datas,
+            doc_id,
+            valid_labels=valid_labels,
+            label_preprocessing=label_preprocessing,
+            label_formatting=label_formatting,
+            page_batch_size=page_batch_size,
+            konvolut_workers=konvolut_workers,
+        )
 
-        konvolut = is_konvolut(page_data)
-        if konvolut:
-            print(f"Document {doc_id} is a Konvolut, resolving")
+    def _iter_page_listing(self, doc_id: str, rows: int) -> Iterator[Optional[dict[str, dict]]]:
+        """
+        Yields Solr responses listing pages of a document, `rows` pages at a time.
+        If a request fails, yields None and stops.
+        """
+        start = 0
+        while True:
+            page_data = ScraperUtils.get_json_from_url(
+                self.list_pages_solr_paged.format(doc_id=doc_id, rows=rows, start=start),
+                transport=self.transport,
+            )
+            yield page_data
+            if page_data is None:
+                return
 
-        if not konvolut:
-            return self.extract_page_ids_from_document(
-                page_data,
-                doc_id,
-                valid_labels=valid_labels,
-                label_preprocessing=label_preprocessing,
-                label_formatting=label_formatting,
+            docs = page_data["response"]["docs"]
+            start += len(docs)
+            if len(docs) == 0 or start >= int(page_data["response"]["numFound"]):
+                return
+
+    @staticmethod
+    def _index_page_listing(
+            page_datas: Iterable[Optional[dict[str, dict]]],
+            doc_id: str,
+            page_index: PageNumberIndex,
+    ) -> Iterator[Optional[dict[str, dict]]]:
+        """
+        Passes Solr listings of a document through and stores its page numbers once all of them were read.
+        """
+        docs = []
+        for page_data in page_datas:
+            yield page_data
+            if page_data is None:
+                return
+            docs.extend(page_data["response"]["docs"])
+        page_index.put_listing(doc_id, docs)
+
+    def get_pages_in_documents(
+            self,
+            doc_ids: Iterable[str],
+            valid_labels: Optional[list[str]] = None,
+            label_preprocessing: Optional[Callable[[str], str]] = None,
+            label_formatting: Callable[[str], str] = inflection.underscore,
+            chunk_size: int = 50,
+            workers: int = 4,
+            page_batch_size: int = PAGE_BATCH_SIZE,
+            konvolut_workers: int = 4,
+            page_index: Optional[PageNumberIndex] = None,
+    ) -> dict[str, list[PageData] | None]:
+        """
+        Same as `get_pages_in_document` for many documents at once.
+        Pages of up to `chunk_size` documents are listed by a single Solr query and then split by their parent.
+
+        :param doc_ids: Document IDs
+        :param valid_labels: list of valid labels strings, if None all labels are valid
+        :param label_preprocessing: function that takes text retrieved from IIIF call and returns preprocessed label
+        :param label_formatting: function that takes label and returns formatted label
+        :param chunk_size: number of documents listed by a single query, bounds the length of request url
+        :param workers: number of queries sent at once
+        :param page_batch_size: number of pages listed by a single request
+        :param konvolut_workers: number of sub-documents of a Konvolut listed at once
+        :param page_index: if given, page numbers of the documents are stored in it from the listings,
+            see `get_pages_in_document`
+
+        :return: dictionary from document ID to list of `PageData` objects or None, if request fails
+        """
+        doc_ids = list(dict.fromkeys(doc_ids))
+        chunks = [doc_ids[i:i + chunk_size] for i in range(0, len(doc_ids), chunk_size)]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            listings = list(tqdm(
+                executor.map(lambda chunk: self._list_pages_of_documents(chunk, rows=page_batch_size), chunks),
+                total=len(chunks),
+            ))
+
+        output: dict[str, list[PageData] | None] = {}
+        for chunk, docs in zip(chunks, listings):
+            if docs is None:
+                output.update((doc_id, None) for doc_id in chunk)
+                continue
+
+            # split pages by their parent, order given by sorting is kept
+            docs_by_parent: dict[str, list[dict]] = defaultdict(list)
+            for doc in docs:
+                docs_by_parent[doc["own_parent.pid"][5:]].append(doc)
+
+            for doc_id in chunk:
+                if page_index is not None:
+                    page_index.put_listing(doc_id, docs_by_parent[doc_id])
+                output[doc_id] = self._process_page_listing(
+                    [{"response": {"docs": docs_by_parent[doc_id]}}],
+                    doc_id,
+                    valid_labels=valid_labels,
+                    label_preprocessing=label_preprocessing,
+                    label_formatting=label_formatting,
+                    page_batch_size=page_batch_size,
+                    konvolut_workers=konvolut_workers,
+                )
+
+        return output
+
+    def _list_pages_of_documents(self, doc_ids: list[str], rows: int = PAGE_BATCH_SIZE) -> Optional[list[dict]]:
+        """
+        Lists pages of all given documents with a single Solr query, paging through results by `rows`.
+        Returns None if any request fails.
+        """
+        parents = " OR ".join(f'"uuid:{doc_id}"' for doc_id in doc_ids)
+        query = (
+            self.solr_search_url
+            + "fl=" + urllib.parse.quote(self.list_pages_fields + ",own_parent.pid", safe=",")
+            + "&q=" + urllib.parse.quote(f"own_parent.pid:({parents})")
+            # pid breaks ties, so that paging is stable
+            + "&sort=" + urllib.parse.quote("rels_ext_index.sort asc,pid asc")
+        )
+
+        docs = []
+        total = None
+        while total is None or len(docs) < total:
+            result = ScraperUtils.get_json_from_url(
+                query + f"&rows={rows}&start={len(docs)}",
+                transport=self.transport,
             )
-        
-        else:
-            output_pages: list[PageData] = []
-            for sub_doc in page_data["response"]["docs"]:
-                sub_page_data = ScraperUtils.get_json_from_url(self.list_pages_solr.format(doc_id=sub_doc["pid"][5:]))
-                if sub_page_data is not None:
+            if result is None:
+                return None
+            total = int(result["response"]["numFound"])
+            if len(result["response"]["docs"]) == 0:
+                break
+            docs.extend(result["response"]["docs"])
+
+        return docs
+
+    def _process_page_listing(
+            self,
+            page_datas: Iterable[Optional[dict[str, dict]]],
+            doc_id: str,
+            valid_labels: Optional[list[str]] = None,
+            label_preprocessing: Optional[Callable[[str], str]] = None,
+            label_formatting: Callable[[str], str] = inflection.underscore,
+            page_batch_size: int = PAGE_BATCH_SIZE,
+            konvolut_workers: int = 4,
+    ) -> list[PageData] | None:
+        """
+        Extracts pages from consecutive Solr listings of a document, resolves the document if it is a Konvolut.
+        Returns None if any of the listings is None.
+        """
+        listing = self._read_page_listing(
+            page_datas,
+            doc_id,
+            valid_labels=valid_labels,
+            label_preprocessing=label_preprocessing,
+            label_formatting=label_formatting,
+        )
+        if listing is None:
+            return None
+
+        pages, sub_doc_ids = listing
+        if sub_doc_ids is None:
+            return pages
+
+        print(f"Document {doc_id} is a Konvolut, resolving")
+        return self._resolve_konvolut(
+            doc_id,
+            sub_doc_ids,
+            valid_labels=valid_labels,
+            label_preprocessing=label_preprocessing,
+            label_formatting=label_formatting,
+            page_batch_size=page_batch_size,
+            workers=konvolut_workers,
+        )
+
+    def _read_page_listing(
+            self,
+            page_datas: Iterable[Optional[dict[str, dict]]],
+            doc_id: str,
+            valid_labels: Optional[list[str]] = None,
+            label_preprocessing: Optional[Callable[[str], str]] = None,
+            label_formatting: Callable[[str], str] = inflection.underscore,
+    ) -> tuple[list[PageData], Optional[list[str]]] | None:
+        """
+        Extracts pages from consecutive Solr listings of a document.
+        Returns pages and None, or no pages and IDs of sub-documents if the document is a Konvolut.
+        Returns None if any of the listings is None.
+        """
+        output_pages: list[PageData] = []
+        # listings seen so far without any page number, the document may be a Konvolut
+        pending: Optional[list[dict[str, dict]]] = []
+
+        for page_data in page_datas:
+            if page_data is None:
+                return None
+
+            if pending is not None and MZKScraper._is_konvolut(page_data):
+                pending.append(page_data)
+                continue
+
+            if pending is not None:
+                for held_page_data in pending:
                     output_pages.extend(
                         self.extract_page_ids_from_document(
-                            sub_page_data,
+                            held_page_data,
                             doc_id,
                             valid_labels=valid_labels,
                             label_preprocessing=label_preprocessing,
                             label_formatting=label_formatting,
-                    ))
-            return output_pages
+                        ))
+                pending = None
 
-    def extract_page_ids_from_document(
+            output_pages.extend(
+                self.extract_page_ids_from_document(
+                    page_data,
+                    doc_id,
+                    valid_labels=valid_labels,
+                    label_preprocessing=label_preprocessing,
+                    label_formatting=label_formatting,
+                ))
+
+        if pending is None:
+            return output_pages, None
+        return [], [sub_doc["pid"][5:] for held_page_data in pending for sub_doc in held_page_data["response"]["docs"]]
+
+    def _resolve_konvolut(
             self,
-            page_info: dict[str, dict],
             doc_id: str,
+            sub_doc_ids: list[str],
             valid_labels: Optional[list[str]] = None,
             label_preprocessing: Optional[Callable[[str], str]] = None,
             label_formatting: Callable[[str], str] = inflection.underscore,
+            page_batch_size: int = PAGE_BATCH_SIZE,
+            workers: int = 4,
     ) -> list[PageData]:
+        """
+        Lists pages of all sub-documents of a Konvolut, pages are assigned to the Konvolut itself.
+        Sub-documents that are Konvoluts themselves are resolved as well, no matter how deep they are nested.
+        Each level of the tree is listed concurrently, every document is listed only once,
+        and pages are returned in the order of sub-documents. Sub-documents whose listing fails are skipped.
+        """
+        visited = {doc_id}
+
+        def read(sub_doc_id: str) -> tuple[list[PageData], Optional[list[str]]] | None:
+            return self._read_page_listing(
+                self._iter_page_listing(sub_doc_id, page_batch_size),
+                doc_id,
+                valid_labels=valid_labels,
+                label_preprocessing=label_preprocessing,
+                label_formatting=label_formatting,
+            )
+
+        # document ID -> IDs of its sub-documents, for Konvoluts
+        parts: dict[str, list[str]] = {doc_id: MZKScraper._unvisited(sub_doc_ids, visited)}
+        # document ID -> its pages, for documents with pages
+        pages: dict[str, list[PageData]] = {}
+
+        frontier = parts[doc_id]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while len(frontier) > 0:
+                frontier = MZKScraper._add_konvolut_level(
+                    frontier, list(executor.map(read, frontier)), parts, pages, visited
+                )
+
+        return MZKScraper._collect_konvolut_pages(doc_id, parts, pages)
+
+    @staticmethod
+    def _unvisited(doc_ids: Iterable[str], visited: set[str]) -> list[str]:
+        """
+        Returns IDs not in `visited` without duplicates, in their original order, and adds them to `visited`.
+        """
+        output = [doc_id for doc_id in dict.fromkeys(doc_ids) if doc_id not in visited]
+        visited.update(output)
+        return output
+
+    @staticmethod
+    def _add_konvolut_level(
+            frontier: list[str],
+            listings: list[tuple[list[PageData], Optional[list[str]]] | None],
+            parts: dict[str, list[str]],
+            pages: dict[str, list[PageData]],
+            visited: set[str],
+    ) -> list[str]:
+        """
+        Records listings of one level of a Konvolut tree, see `_read_page_listing`, into `parts` and `pages`.
+        Listings that failed are skipped. Returns unvisited sub-documents, i.e. the next level.
+        """
+        next_frontier = []
+        for sub_doc_id, listing in zip(frontier, listings):
+            if listing is None:
+                continue
+            sub_pages, sub_sub_doc_ids = listing
+            if sub_sub_doc_ids is None:
+                pages[sub_doc_id] = sub_pages
+            else:
+                parts[sub_doc_id] = MZKScraper._unvisited(sub_sub_doc_ids, visited)
+                next_frontier.extend(parts[sub_doc_id])
+        return next_frontier
+
+    @staticmethod
+    def _collect_konvolut_pages(
+            doc_id: str,
+            parts: dict[str, list[str]],
+            pages: dict[str, list[PageData]],
+    ) -> list[PageData]:
+        """
+        Joins pages of a resolved Konvolut tree, walking it in the original order of sub-documents.
+        """
+        output_pages: list[PageData] = []
+        stack = [doc_id]
+        while len(stack) > 0:
+            current = stack.pop()
+            if current in pages:
+                output_pages.extend(pages[current])
+            else:
+                stack.extend(reversed(parts.get(current, [])))
+        return output_pages
+
+    @staticmethod
+    def _is_konvolut(page_data: dict[str, dict]) -> bool:
+        return all(sheet.get("page.number") is None for sheet in page_data["response"]["docs"])
+
+    @staticmethod
+    def extract_page_ids_from_document(
+            page_info: dict[str, dict],
+            doc_id: str,
+            valid_labels: Optional[list[str]] = None,
+            label_preprocessing: Optional[Callable[[str], str]] = None,
+            label_formatting: Callable[[str], str] = inflection.underscore,
+            table: Optional[PageDataTable] = None,
+    ) -> list[PageData] | PageDataTable:
         """
         Processes JSON with information about all pages inside a document.
         Returns list of `ImageData` objects.
@@ -270,8 +870,9 @@ class MZKScraper(MZKBase):
         :param valid_labels: list of valid labels strings, if None all labels are valid
         :param label_preprocessing: function that takes text retrieved from IIIF call and returns preprocessed label
         :param label_formatting: function that takes label and returns formatted label
+        :param table: if given, pages are appended to this table instead of being created as `PageData` objects
 
-        :return: List of `ImageData` objects or None, if request fails
+        :return: List of `ImageData` objects, or `table` with appended pages if given
         """
         if label_preprocessing is None:
             label_preprocessing = MZKScraper._strip_page_label
@@ -281,18 +882,50 @@ class MZKScraper(MZKBase):
             label = sheet["page.type"]
             label = label_preprocessing(label)
             if valid_labels is None or label in valid_labels:
-                output.append(
-                    PageData(
-                        doc_id,
-                        sheet["pid"][5:],
-                        label_formatting(label),
+                if table is not None:
+                    table.append(doc_id, sheet["pid"][5:], label_formatting(label))
+                else:
+                    output.append(
+                        PageData(
+                            doc_id,
+                            sheet["pid"][5:],
+                            label_formatting(label),
+                        )
                     )
-                )
 
+        if table is not None:
+            return table
         return output
 
-    def _get_img_request_url(self, img_id: str, size: str) -> str:
-        return self.iiif_download_url.format(img_id=img_id, size=size)
+    def _save_image(self, url: str, filepath: Path, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> int:
+        """
+        Streams image from url into a temporary file next to `filepath`,
+        the file is renamed to `filepath` only after the whole image is received.
+        Images from cached urls are served by the transport cache instead.
+        Returns status code of the response.
+        """
+        if self.transport.is_cached(url):
+            status_code, body = self.transport.fetch(url)
+            if status_code == 200:
+                MZKScraper._write_atomically(filepath, [body])
+            return status_code
+
+        with self.transport.get(url, stream=True) as response:
+            if response.status_code == 200:
+                MZKScraper._write_atomically(filepath, response.iter_content(chunk_size=chunk_size))
+            return response.status_code
+
+    @staticmethod
+    def _write_atomically(filepath: Path, chunks: Iterable[bytes]):
+        fd, tmp_path = tempfile.mkstemp(dir=filepath.parent, prefix=f".{filepath.name}.", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                for chunk in chunks:
+                    file.write(chunk)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
 
     def download_image(
             self,
@@ -301,7 +934,7 @@ class MZKScraper(MZKBase):
             output_dir: Path,
             size: str = "^!640,640",
             verbose=False,
-    ):
+    ) -> bool:
         """
         Given an image ID downloads it to specified directory.
 
@@ -310,36 +943,141 @@ class MZKScraper(MZKBase):
         :param output_dir: output directory
         :param size: size of image, for more see IIIF docs
         :param verbose: verbose mode
+
+        :return: True if the image was downloaded, False otherwise
         """
         # create the output directory if it doesn't exist
         output_dir.mkdir(exist_ok=True, parents=True)
 
         # download the corresponding image using url
         url = self._get_img_request_url(img_id, size)
-        response = requests.get(url)
-        if response.status_code == 200:
-            filepath = Path(output_dir / file_name)
-            # write to file
-            with open(filepath, "wb") as file:
-                file.write(response.content)
+        status_code = self._save_image(url, Path(output_dir / file_name))
+        if status_code == 200:
             if verbose:
                 print(f"Image downloaded: {file_name}")
+            return True
         else:
-            print(f"Error: {response.status_code}")
+            print(f"Error: {status_code}")
+            return False
 
-    def get_image(self, img_id: str, size: str = "^!640,640", verbose=False) -> Optional[Image.ImageFile.ImageFile]:
+    @staticmethod
+    def _default_page_file_name(page: PageData) -> str:
+        return f"{page.page_id}.jpg"
+
+    def download_pages(
+            self,
+            pages: Iterable[PageData],
+            output_dir: Path,
+            size: str = "^!640,640",
+            workers: int = 8,
+            max_per_host: Optional[int] = None,
+            file_name_gen: Optional[Callable[[PageData], str]] = None,
+            progress: bool = True,
+    ) -> DownloadResult:
         """
-        Given an image ID downloads it to specified directory.
+        Downloads images of all given pages concurrently.
+
+        Number of connections kept alive by the transport is limited by its `pool_maxsize`,
+        `workers` should not exceed it, otherwise some connections are thrown away after each request.
+
+        :param pages: pages to download, for example output of `get_pages_in_document`
+        :param output_dir: output directory
+        :param size: size of images, for more see IIIF docs
+        :param workers: number of images downloaded at once
+        :param max_per_host: maximum number of images downloaded at once from a single host,
+            if None only `workers` applies
+        :param file_name_gen: function that takes a page and returns output file name, defaults to "{page_id}.jpg"
+        :param progress: whether to show progress bar
+
+        :return: `DownloadResult` with downloaded and failed pages
+        """
+        if file_name_gen is None:
+            file_name_gen = MZKScraper._default_page_file_name
+
+        pages = list(pages)
+        output_dir.mkdir(exist_ok=True, parents=True)
+
+        host_slots: dict[str, threading.BoundedSemaphore] = defaultdict(
+            lambda: threading.BoundedSemaphore(max_per_host if max_per_host is not None else workers)
+        )
+        host_slots_lock = threading.Lock()
+
+        def download(page: PageData) -> tuple[PageData, Path, Optional[str]]:
+            url = self._get_img_request_url(page.page_id, size)
+            filepath = Path(output_dir / file_name_gen(page))
+            with host_slots_lock:
+                slot = host_slots[urllib.parse.urlsplit(url).netloc]
+            try:
+                with slot:
+                    status_code = self._save_image(url, filepath)
+            except Exception as e:
+                return page, filepath, str(e)
+            if status_code != 200:
+                return page, filepath, f"Status code: {status_code}"
+            return page, filepath, None
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(download, page) for page in pages]
+            for _ in tqdm(as_completed(futures), total=len(futures), disable=not progress):
+                pass
+
+        # keep the order of input pages
+        result = DownloadResult()
+        for future in futures:
+            page, filepath, error = future.result()
+            if error is None:
+                result.succeeded.append((page, filepath))
+            else:
+                result.failed.append((page, error))
+
+        return result
+
+    def get_image(
+            self,
+            img_id: str,
+            size: str = "^!640,640",
+            verbose=False,
+            max_bytes: Optional[int] = 64 * 1024 * 1024,
+    ) -> Optional[ImageFile.ImageFile]:
+        """
+        Given an image ID downloads it and returns it as `PIL` image.
 
         :param img_id: image ID
         :param size: size of image, for more see IIIF docs
         :param verbose: verbose mode
+        :param max_bytes: maximum size of the downloaded image in bytes, larger images are not loaded into memory,
+            None for no limit
         """
         # download the corresponding image using url
         url = self._get_img_request_url(img_id, size)
-        response = requests.get(url)
-        if response.status_code == 200:
-            return Image.open(BytesIO(response.content))
-        else:
-            print(f"Error: {response.status_code}")
-            return None
+        if self.transport.is_cached(url):
+            status_code, body = self.transport.fetch(url)
+            if status_code != 200:
+                print(f"Error: {status_code}")
+                return None
+            if max_bytes is not None and len(body) > max_bytes:
+                print(f"Error: Image {img_id} has {len(body)} bytes, limit is {max_bytes}")
+                return None
+            return Image.open(BytesIO(body))
+
+        with self.transport.get(url, stream=True) as response:
+            if response.status_code != 200:
+                print(f"Error: {response.status_code}")
+                return None
+
+            content_length = response.headers.get("Content-Length")
+            if max_bytes is not None and content_length is not None and int(content_length) > max_bytes:
+                print(f"Error: Image {img_id} has {content_length} bytes, limit is {max_bytes}")
+                return None
+
+            buffer = BytesIO()
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                buffer.write(chunk)
+                if max_bytes is not None and buffer.tell() > max_bytes:
+                    print(f"Error: Image {img_id} exceeds limit of {max_bytes} bytes")
+                    return None
+
+        if verbose:
+            print(f"Image downloaded: {img_id}")
+        buffer.seek(0)
+        return Image.open(buffer)
@@ -1,22 +1,21 @@
-import requests
+from typing import Optional
 
+from .Transport import MZKTransport, get_default_transport
 
-def get_json_from_url(url: str):
+
+def get_json_from_url(url: str, transport: Optional[MZKTransport] = None):
     """
     Given an url string, returns a JSON object.
 
     :param url: url string
+    :param transport: transport used to send the request, shared default transport is used if None
 
     :returns: JSON object or None, if the request fails
     """
+    if transport is None:
+        transport = get_default_transport()
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            json_data = response.json()
-            return json_data
-        else:
-            print(f"Error: Failed to retrieve data. Status code: {response.status_code}")
-            return None
+        return transport.get_json(url)
     except Exception as e:
         print(f"Error: {e}")
         return None
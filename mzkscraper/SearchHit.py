@@ -0,0 +1,60 @@
+from typing import Optional
+
+SEARCH_HIT_FIELDS = (
+    "pid",
+    "model",
+    "title.search",
+    "authors",
+    "date.str",
+    "licenses",
+    "accessibility",
+)
+
+
+class SearchHit:
+    """
+    Keeps basic information about a single document returned by Solr search.
+    """
+
+    def __init__(
+            self,
+            doc_id: str,
+            title: Optional[str] = None,
+            date: Optional[str] = None,
+            authors: Optional[list[str]] = None,
+            model: Optional[str] = None,
+            licenses: Optional[list[str]] = None,
+            accessibility: Optional[str] = None,
+            fields: Optional[dict] = None,
+    ):
+        self.doc_id = doc_id
+        self.title = title
+        self.date = date
+        self.authors = authors if authors is not None else []
+        self.model = model
+        self.licenses = licenses if licenses is not None else []
+        self.accessibility = accessibility
+        # remaining requested Solr fields
+        self.fields = fields if fields is not None else {}
+
+    @classmethod
+    def from_solr_doc(cls, doc: dict) -> "SearchHit":
+        """
+        Creates `SearchHit` from a single Solr document.
+
+        :param doc: Solr document, has to contain "pid"
+        """
+        doc = dict(doc)
+        return cls(
+            doc.pop("pid")[5:],
+            title=doc.pop("title.search", None),
+            date=doc.pop("date.str", None),
+            authors=doc.pop("authors", None),
+            model=doc.pop("model", None),
+            licenses=doc.pop("licenses", None),
+            accessibility=doc.pop("accessibility", None),
+            fields=doc,
+        )
+
+    def __str__(self):
+        return f'{self.doc_id} {self.model} {self.title} {self.date}'
@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .RateLimit import RateLimiter, get_endpoint
+from .ResponseCache import ResponseCache
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def get_backoff(attempt: int, backoff_factor: float, max_backoff: float, retry_after: Optional[str] = None) -> float:
+    """
+    Returns number of seconds to wait before the next retry.
+
+    :param attempt: number of already failed attempts, starting at 0
+    :param backoff_factor: base of the exponential backoff
+    :param max_backoff: upper bound of the wait
+    :param retry_after: value of `Retry-After` header, if present it takes precedence over the exponential backoff
+    """
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), max_backoff)
+        except ValueError:
+            pass
+    return min(backoff_factor * 2 ** attempt, max_backoff)
+
+
+class MZKTransport:
+    """
+    Shared HTTP layer for all requests sent to MZK, IIIF and the citation service.
+
+    Keeps a single `requests.Session` with a keep-alive connection pool, so consecutive requests
+    to the same host reuse already established TCP/TLS connections.
+    Requests that fail with a connection error or with one of `RETRY_STATUS_CODES` are retried
+    with exponential backoff, `Retry-After` header is respected when present.
+    If a `ResponseCache` is given, `fetch` and `get_json` serve cached bodies and revalidate stale ones.
+    If a `RateLimiter` is given, every attempt waits for it and reports its latency and outcome back,
+    so the number of requests in flight adapts to how the server copes.
+    """
+
+    def __init__(
+            self,
+            pool_connections: int = 4,
+            pool_maxsize: int = 16,
+            timeout: float | tuple[float, float] = (10, 60),
+            max_retries: int = 3,
+            backoff_factor: float = 0.5,
+            max_backoff: float = 30,
+            cache: Optional[ResponseCache] = None,
+            rate_limiter: Optional[RateLimiter] = None,
+    ):
+        """
+        :param pool_connections: number of hosts to keep connection pools for
+        :param pool_maxsize: maximum number of kept-alive connections per host
+        :param timeout: request timeout in seconds, either a single value or a (connect, read) tuple
+        :param max_retries: how many times a failed request is retried, 0 disables retries
+        :param backoff_factor: base of the exponential backoff, n-th retry waits `backoff_factor * 2 ** n` seconds
+        :param max_backoff: upper bound of a single wait between retries in seconds
+        :param cache: persistent cache for response bodies, nothing is cached if None
+        :param rate_limiter: limiter of request rate and concurrency, may be shared with other transports,
+            requests are not limited if None
+        """
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, stream: bool = False, **kwargs) -> requests.Response:
+        """
+        Sends GET request, retries on connection errors and on `RETRY_STATUS_CODES`.
+        The last response is returned even if its status code signals an error.
+
+        :param url: url string
+        :param stream: if True, response body is not downloaded until accessed
+        :param kwargs: other arguments passed to `requests.Session.get`
+
+        :return: response
+        """
+        kwargs.setdefault("timeout", self.timeout)
+
+        attempt = 0
+        while True:
+            try:
+                response = self._send(url, stream, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._get_backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                return response
+
+            wait = self._get_backoff(attempt, response.headers.get("Retry-After"))
+            # release connection back to the pool before waiting
+            response.close()
+            time.sleep(wait)
+            attempt += 1
+
+    def _send(self, url: str, stream: bool, **kwargs) -> requests.Response:
+        if self.rate_limiter is None:
+            return self.session.get(url, stream=stream, **kwargs)
+
+        self.rate_limiter.acquire()
+        start = time.monotonic()
+        error = True
+        try:
+            response = self.session.get(url, stream=stream, **kwargs)
+            error = response.status_code in RETRY_STATUS_CODES
+            return response
+        finally:
+            # with `stream`, only the time to response headers is measured
+            self.rate_limiter.release(time.monotonic() - start, error, get_endpoint(url))
+
+    def is_cached(self, url: str) -> bool:
+        """
+        Returns whether responses from given url are stored in the cache.
+        """
+        return self.cache is not None and self.cache.get_ttl(url) is not None
+
+    def fetch(self, url: str) -> tuple[int, Optional[bytes]]:
+        """
+        Sends GET request and returns its status code and body, body is None if the request failed.
+        Responses are served from and stored to the cache, if the url is cacheable.
+
+        :param url: url string
+
+        :return: status code and response body
+        """
+        if not self.is_cached(url):
+            response = self.get(url)
+            return response.status_code, response.content if response.status_code == 200 else None
+
+        entry = self.cache.lookup(url)
+        if entry is not None and self.cache.is_fresh(url, entry):
+            return 200, entry.body
+
+        # revalidate stale entry
+        headers = {}
+        if entry is not None and entry.etag is not None:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified is not None:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        response = self.get(url, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(url)
+            return 200, entry.body
+        if response.status_code == 200:
+            self.cache.store(
+                url,
+                response.content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+            return 200, response.content
+        return response.status_code, None
+
+    def get_json(self, url: str):
+        """
+        Given an url string, returns a JSON object.
+
+        :param url: url string
+
+        :returns: JSON object or None, if the request fails
+        """
+        status_code, body = self.fetch(url)
+        if status_code == 200:
+            return json.loads(body)
+        print(f"Error: Failed to retrieve data. Status code: {status_code}")
+        return None
+
+    def _get_backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        return get_backoff(attempt, self.backoff_factor, self.max_backoff, retry_after)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_default_transport: Optional[MZKTransport] = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport() -> MZKTransport:
+    """
+    Returns transport shared by all objects that were not given their own, its requests go through a `RateLimiter`.
+    """
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = MZKTransport(rate_limiter=RateLimiter())
+        return _default_transport
+
+
+def _reset_default_transport():
+    # a forked child must not share kept-alive connections or the rate limiter state with its parent
+    global _default_transport, _default_transport_lock
+    _default_transport = None
+    _default_transport_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_default_transport)
@@ -14,6 +14,10 @@ setup(
         "tqdm==4.66.1",
         "blinker==1.7.0"
     ],
+    extras_require={
+        "async": ["aiohttp==3.10.10"],
+        "lxml": ["lxml==5.3.0"],
+    },
     author="Vojtech Dvorak",
     url="https://github.com/v-dvorak/mzkscraper",
 )